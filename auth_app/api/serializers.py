@@ -1,7 +1,16 @@
 from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
 
 
+# Case-insensitive unique index on the email of the users
+# (see auth_app/migrations/0002_user_email_ci_unique.py).
+EMAIL_UNIQUE_INDEX = "auth_user_email_ci_unique"
+# How the unique constraint of the username appears in the errors of SQLite
+# and PostgreSQL.
+USERNAME_UNIQUE_CONSTRAINTS = ("auth_user.username", "auth_user_username_key")
+
+
 class RegistrationSerializer(serializers.ModelSerializer):
 
     confirmed_password = serializers.CharField(write_only=True)
@@ -13,14 +22,6 @@ class RegistrationSerializer(serializers.ModelSerializer):
             "email": {"required": True}
         }
 
-    def validate_email(self, value):
-        """
-        Checks if the entered email already exists. If so, a validation error will be raised.
-        """
-        if User.objects.filter(email=value).exists():
-            raise serializers.ValidationError("Email already in use.")
-        return value
-    
     def validate(self, attrs):
         """
         Compares the password and confirmed password. If they don't match, 
@@ -34,8 +35,21 @@ class RegistrationSerializer(serializers.ModelSerializer):
         """
         Custom create method has to be used, so that when creating a user, the password will
         be hashed.
+        The uniqueness of the email is checked by the database index, instead of a query
+        before the insert, which could not prevent two registrations at the same time.
+        If the email or username already exists, a validation error will be raised.
+        Other integrity errors are raised unchanged.
         """
         username = validated_data["username"]
         password = validated_data["password"]
         email = validated_data["email"]
-        return User.objects.create_user(username=username, email=email, password=password)
\ No newline at end of file
+        try:
+            with transaction.atomic():
+                return User.objects.create_user(username=username, email=email, password=password)
+        except IntegrityError as e:
+            if EMAIL_UNIQUE_INDEX in str(e):
+                raise serializers.ValidationError({"email": ["Email already in use."]})
+            if any(constraint in str(e) for constraint in USERNAME_UNIQUE_CONSTRAINTS):
+                raise serializers.ValidationError(
+                    {"username": ["A user with that username already exists."]})
+            raise
\ No newline at end of file
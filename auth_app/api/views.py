@@ -1,13 +1,17 @@
-from django.contrib.auth.models import User
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework import status, serializers
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
 )
 from drf_spectacular.utils import extend_schema, inline_serializer
+from auth_app.authentication import CookieJWTAuthentication
+from auth_app.revocation import is_revoked, revoke
+from auth_app.throttling import LoginIPThrottle, LoginUsernameThrottle, RegistrationIPThrottle
 from .serializers import RegistrationSerializer
 
 
@@ -23,6 +27,7 @@ from .serializers import RegistrationSerializer
 )
 class RegistrationView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [RegistrationIPThrottle]
 
     def post(self, req):
         serializer = RegistrationSerializer(data=req.data)
@@ -57,20 +62,35 @@ class RegistrationView(APIView):
 )
 class LoginView(TokenObtainPairView):
     permission_classes = [AllowAny]
+    throttle_classes = [LoginIPThrottle, LoginUsernameThrottle]
 
     def post(self, request, *args, **kwargs):
         """
         Overrides the default post() method. After successfully entering the 
         username and password for login, an access and refresh token will be 
         set into the response as a cookie. 
+        The user authenticated by the serializer is used for the response, so the
+        login needs only one user lookup.
         """
-        response = super().post(request, *args, **kwargs)
-        refresh = response.data.get("refresh")
-        access = response.data.get("access")
+        serializer = self.get_serializer(data=request.data)
+        try:
+            serializer.is_valid(raise_exception=True)
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+
+        user = serializer.user
+        response = Response({
+            "detail": "Login successfully!",
+            "user": {
+                "id": user.pk,
+                "username": user.username,
+                "email": user.email
+            }
+        })
 
         response.set_cookie(
             key="access_token",
-            value=access,
+            value=serializer.validated_data.get("access"),
             httponly=True,
             secure=True,
             samesite="Lax"
@@ -78,25 +98,11 @@ class LoginView(TokenObtainPairView):
 
         response.set_cookie(
             key="refresh_token",
-            value=refresh,
+            value=serializer.validated_data.get("refresh"),
             httponly=True,
             secure=True,
             samesite="Lax"
         )
-
-        try:
-            user = User.objects.get(username=request.data["username"])
-        except User.DoesNotExist:
-            return Response("User not found.")
-
-        response.data = {
-            "detail": "Login successfully!",
-            "user": {
-                "id": user.pk,
-                "username": user.username,
-                "email": user.email
-            }
-        }
         return response
 
 
@@ -115,7 +121,15 @@ class LogoutView(APIView):
         """
         Deletes the access and refresh token from the response cookie. 
         User has to re enter his initials if he wants to continue.
+        The refresh token is revoked, so it can't be used anymore, even if a copy of
+        it still exists.
         """
+        refresh_token = request.COOKIES.get("refresh_token")
+        if refresh_token is not None:
+            try:
+                revoke(RefreshToken(refresh_token))
+            except TokenError:
+                pass
         response = Response(
             {
                 "detail": "Log-Out successfully! All Tokens will be deleted. Refresh token is now invalid."
@@ -145,6 +159,10 @@ class RefreshView(TokenRefreshView):
         If the access token has expired, the user can claim another one.
         With the help of this view, it makes use of the refresh token. 
         If it is valid, the view will return a new access token via the response cookie.
+        The token is checked directly instead of with the serializer: the signature and
+        expiry are verified without the database, the revocation against the revoked
+        tokens in memory (see auth_app.revocation) and the user with the cached user
+        lookup of the authentication.
         """
         refresh_token = request.COOKIES.get("refresh_token")
 
@@ -154,17 +172,18 @@ class RefreshView(TokenRefreshView):
                 status=status.HTTP_401_UNAUTHORIZED
             )
 
-        serializer = self.get_serializer(data={"refresh": refresh_token})
-
         try:
-            serializer.is_valid(raise_exception=True)
-        except:
+            refresh = RefreshToken(refresh_token)
+            if is_revoked(refresh):
+                raise TokenError("Token is revoked")
+            CookieJWTAuthentication().get_user(refresh)
+        except (TokenError, AuthenticationFailed):
             return Response(
                 {"detail": "Refresh token invalid"},
                 status=status.HTTP_401_UNAUTHORIZED
             )
 
-        access_token = serializer.validated_data.get("access")
+        access_token = str(refresh.access_token)
         response = Response(
             {
                 "detail": "Token refreshed",
@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class AuthAppConfig(AppConfig):
     name = 'auth_app'
+
+    def ready(self):
+        """
+        Connects the signals, which keep the user cache of the authentication up to date.
+        """
+        from . import signals  # noqa: F401
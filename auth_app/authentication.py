@@ -1,5 +1,83 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+# Maps the user ids (as string, like the user id claim of the tokens) to
+# (expiry time, user), least recently used first.
+_user_cache = OrderedDict()
+_user_cache_lock = threading.Lock()
+
+
+def _shared_user_cache():
+    alias = settings.AUTH_USER_CACHE_ALIAS
+    return caches[alias] if alias else None
+
+
+def _user_cache_key(user_id):
+    return f"auth-user:{user_id}"
+
+
+def get_cached_user(user_id):
+    """
+    Returns the cached user with the given id, or None if it is not cached or the
+    entry has expired.
+    """
+    if settings.AUTH_USER_CACHE_TTL <= 0:
+        return None
+    user_id = str(user_id)
+    shared_cache = _shared_user_cache()
+    if shared_cache is not None:
+        return shared_cache.get(_user_cache_key(user_id))
+    with _user_cache_lock:
+        entry = _user_cache.get(user_id)
+        if entry is None:
+            return None
+        expires_at, user = entry
+        if expires_at < time.monotonic():
+            del _user_cache[user_id]
+            return None
+        _user_cache.move_to_end(user_id)
+    # Every request gets its own copy, so changes to it don't leak into others.
+    return copy.copy(user)
+
+
+def cache_user(user_id, user):
+    """
+    Caches the user for AUTH_USER_CACHE_TTL seconds. The in-process cache keeps at
+    most AUTH_USER_CACHE_MAX_ENTRIES users and removes the least recently used ones.
+    """
+    if settings.AUTH_USER_CACHE_TTL <= 0:
+        return
+    user_id = str(user_id)
+    shared_cache = _shared_user_cache()
+    if shared_cache is not None:
+        shared_cache.set(_user_cache_key(user_id), user, settings.AUTH_USER_CACHE_TTL)
+        return
+    with _user_cache_lock:
+        _user_cache[user_id] = (time.monotonic() + settings.AUTH_USER_CACHE_TTL, copy.copy(user))
+        _user_cache.move_to_end(user_id)
+        while len(_user_cache) > settings.AUTH_USER_CACHE_MAX_ENTRIES:
+            _user_cache.popitem(last=False)
+
+
+def invalidate_cached_user(user_id):
+    """
+    Removes the user from the cache (see auth_app.signals).
+    """
+    user_id = str(user_id)
+    shared_cache = _shared_user_cache()
+    if shared_cache is not None:
+        shared_cache.delete(_user_cache_key(user_id))
+    with _user_cache_lock:
+        _user_cache.pop(user_id, None)
 
 
 class CookieJWTAuthentication(JWTAuthentication):
@@ -19,3 +97,22 @@ class CookieJWTAuthentication(JWTAuthentication):
             return (user, validated_token)
         except (InvalidToken, TokenError, AuthenticationFailed):
             return None
+
+    def get_user(self, validated_token):
+        """
+        Returns the user of the token. Users are cached for a short time (see
+        get_cached_user), so most requests don't need a database query to
+        authenticate. Saving or deleting the user removes the entry of this process
+        (or of the shared cache, see AUTH_USER_CACHE_ALIAS). Other processes see a
+        deactivation or password change after at most AUTH_USER_CACHE_TTL seconds.
+        """
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        user = None if user_id is None else get_cached_user(user_id)
+        if user is None:
+            user = super().get_user(validated_token)
+            cache_user(user_id, user)
+        elif api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed("The user's password has been changed.",
+                                       code="password_changed")
+        return user
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.contrib.auth.hashers import (Argon2PasswordHasher, BCryptSHA256PasswordHasher,
+                                         PBKDF2PasswordHasher)
+
+
+class PBKDF2CostPasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2 with the number of iterations from PASSWORD_PBKDF2_ITERATIONS (defaults to
+    the iterations of Django). If the cost changes, stored hashes are updated on the
+    next successful login.
+    """
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS or PBKDF2PasswordHasher.iterations
+
+
+class Argon2CostPasswordHasher(Argon2PasswordHasher):
+    """
+    Argon2 with the time and memory cost from ARGON2_TIME_COST and ARGON2_MEMORY_COST
+    (in KiB). Needs argon2-cffi.
+    """
+    @property
+    def time_cost(self):
+        return settings.ARGON2_TIME_COST or Argon2PasswordHasher.time_cost
+
+    @property
+    def memory_cost(self):
+        return settings.ARGON2_MEMORY_COST or Argon2PasswordHasher.memory_cost
+
+
+class BCryptCostPasswordHasher(BCryptSHA256PasswordHasher):
+    """
+    bcrypt with 2^BCRYPT_ROUNDS rounds. Needs bcrypt.
+    """
+    @property
+    def rounds(self):
+        return settings.BCRYPT_ROUNDS or BCryptSHA256PasswordHasher.rounds
@@ -0,0 +1,63 @@
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from django.contrib.auth.hashers import get_hasher
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.urls import reverse
+from rest_framework.test import APIRequestFactory
+from auth_app.api.views import LoginView
+
+
+class Command(BaseCommand):
+    help = ("Measures the login throughput with the configured password hasher. "
+            "Creates a temporary user, which is deleted afterwards. The rate limits are "
+            "not applied.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--logins", type=int, default=50, help="Number of logins.")
+        parser.add_argument("--threads", type=int, default=1,
+                            help="Number of threads, which log in at the same time.")
+        parser.add_argument("--host", default="localhost",
+                            help="Host of the requests, has to be allowed in ALLOWED_HOSTS.")
+
+    def handle(self, *args, **options):
+        username = f"login-benchmark-{uuid.uuid4().hex[:8]}"
+        password = uuid.uuid4().hex
+        user = User.objects.create_user(username=username, password=password)
+        view = LoginView.as_view(throttle_classes=[])
+        url = reverse("login")
+
+        def login(_):
+            request = APIRequestFactory().post(url, {"username": username, "password": password},
+                                               format="json", HTTP_HOST=options["host"])
+            start = time.perf_counter()
+            response = view(request)
+            duration = (time.perf_counter() - start) * 1000
+            if response.status_code != 200:
+                raise CommandError(f"Login failed with status {response.status_code}.")
+            return duration
+
+        def login_in_thread(number):
+            try:
+                return login(number)
+            finally:
+                connection.close()
+
+        try:
+            start = time.perf_counter()
+            if options["threads"] <= 1:
+                durations = [login(number) for number in range(options["logins"])]
+            else:
+                with ThreadPoolExecutor(options["threads"]) as pool:
+                    durations = list(pool.map(login_in_thread, range(options["logins"])))
+            elapsed = time.perf_counter() - start
+        finally:
+            user.delete()
+        self.stdout.write(f"{options['logins']} logins with {options['threads']} threads "
+                          f"({get_hasher().algorithm}):")
+        self.stdout.write(f"  {options['logins'] / elapsed:.1f} logins/s, "
+                          f"median {statistics.median(durations):.1f} ms, "
+                          f"max {max(durations):.1f} ms")
@@ -0,0 +1,100 @@
+import csv
+import os
+from concurrent.futures import ThreadPoolExecutor
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models.functions import Lower
+
+
+class Command(BaseCommand):
+    help = ("Registers many users at once, e.g. a whole classroom, from a CSV file with the "
+            "columns username, email and password. Usernames and emails are validated like "
+            "in the registration API. Invalid rows and rows with an existing username or "
+            "email are skipped. Every batch is committed on its own, so if the command "
+            "fails, the users of the earlier batches stay registered and are skipped when "
+            "the command is run again.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Path of the CSV file.")
+        parser.add_argument("--batch-size", type=int, default=500,
+                            help="Number of users, which are inserted with one statement.")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                            help="Number of threads, which hash the passwords.")
+
+    def handle(self, *args, **options):
+        with open(options["path"], newline="", encoding="utf-8") as file:
+            reader = csv.DictReader(file)
+            missing = {"username", "email", "password"} - set(reader.fieldnames or [])
+            if missing:
+                raise CommandError(f"Missing columns: {', '.join(sorted(missing))}.")
+            rows = list(reader)
+
+        registered = 0
+        skipped = []
+        seen = (set(), set())
+        batch_size = options["batch_size"]
+        # Hashing is by far the slowest part. The hash functions release the GIL,
+        # so the passwords of a batch are hashed in parallel by the threads.
+        with ThreadPoolExecutor(options["workers"]) as pool:
+            for start in range(0, len(rows), batch_size):
+                batch = self.filter_new_users(rows[start:start + batch_size], start, seen,
+                                             skipped)
+                passwords = pool.map(make_password, [row["password"] for row in batch])
+                users = [User(username=row["username"], email=row["email"], password=password)
+                         for row, password in zip(batch, passwords)]
+                User.objects.bulk_create(users)
+                registered += len(users)
+
+        for line, reason in skipped:
+            self.stdout.write(f"Skipped line {line}: {reason}")
+        self.stdout.write(f"Registered {registered} users, skipped {len(skipped)}.")
+
+    def filter_new_users(self, rows, start, seen, skipped):
+        """
+        Returns the rows, which can be registered. Incomplete or invalid rows and rows
+        with a username or email, which already exists or appears earlier in the file
+        (seen), are added to skipped with their line number. Existing users are looked up with
+        one query per column and batch.
+        """
+        for row in rows:
+            row["username"] = (row["username"] or "").strip()
+            row["email"] = (row["email"] or "").strip()
+        usernames = {row["username"] for row in rows}
+        emails = {row["email"].lower() for row in rows}
+        taken_usernames = set(User.objects.filter(username__in=usernames)
+                              .values_list("username", flat=True))
+        taken_emails = set(User.objects.annotate(email_lower=Lower("email"))
+                           .filter(email_lower__in=emails)
+                           .values_list("email_lower", flat=True))
+        seen_usernames, seen_emails = seen
+        new_rows = []
+        for index, row in enumerate(rows, start=start + 2):
+            email = row["email"].lower()
+            if not row["username"] or not email or not row["password"]:
+                skipped.append((index, "username, email and password are required"))
+            elif error := self.validate_row(row):
+                skipped.append((index, error))
+            elif row["username"] in taken_usernames or row["username"] in seen_usernames:
+                skipped.append((index, f"username {row['username']} already exists"))
+            elif email in taken_emails or email in seen_emails:
+                skipped.append((index, f"email {row['email']} already exists"))
+            else:
+                seen_usernames.add(row["username"])
+                seen_emails.add(email)
+                new_rows.append(row)
+        return new_rows
+
+    def validate_row(self, row):
+        """
+        Runs the validators of the username and email fields of the user model, which
+        are also used by RegistrationSerializer (e.g. the allowed characters of the
+        username, the email format and the max_length). Returns the first error or None.
+        """
+        for name in ("username", "email"):
+            try:
+                User._meta.get_field(name).run_validators(row[name])
+            except ValidationError as e:
+                return f"{name} {row[name]} is invalid: {' '.join(e.messages)}"
+        return None
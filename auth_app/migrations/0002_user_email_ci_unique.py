@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Makes the email addresses of the users unique, ignoring the case. Users without
+    an email address (e.g. superusers created without one) are not affected.
+    Fails, if there already are users with the same email address.
+    """
+
+    dependencies = [
+        ('auth_app', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql="CREATE UNIQUE INDEX auth_user_email_ci_unique ON auth_user (LOWER(email)) "
+                "WHERE email <> ''",
+            reverse_sql="DROP INDEX auth_user_email_ci_unique",
+        ),
+    ]
@@ -1,3 +1,16 @@
 from django.db import models
+from django.utils import timezone
 
 # Create your models here.
+
+
+class RevokedToken(models.Model):
+    """
+    A refresh token, which was revoked by a logout. Only the jti claim, the
+    expiry of the token and the time of the revocation are stored. Expired entries
+    are removed automatically (see auth_app.revocation), because expired tokens are
+    rejected anyway. The processes load new revocations by revoked_at.
+    """
+    jti = models.CharField(max_length=64, primary_key=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(default=timezone.now, db_index=True)
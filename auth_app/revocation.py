@@ -0,0 +1,92 @@
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import datetime_from_epoch
+from auth_app.models import RevokedToken
+
+
+# Revocations committed up to this long after they were created are still found
+# by the incremental sync.
+SYNC_OVERLAP = timedelta(minutes=1)
+
+# Unexpired revoked jtis, mapped to the expiry of their token. New revocations are
+# loaded from the database at most every TOKEN_REVOCATION_SYNC_INTERVAL seconds.
+_revoked = {}
+_revoked_lock = threading.Lock()
+_last_purge = 0.0
+_last_sync = None
+# Time of the last sync. Only revocations since then (minus SYNC_OVERLAP) are loaded.
+_watermark = None
+
+
+def _remember(jti, expires_at):
+    with _revoked_lock:
+        _revoked[jti] = expires_at
+
+
+def _sync():
+    """
+    Adds the revocations of the database since the last sync, which also contain the
+    revocations of other processes, and drops the expired ones from memory. The first
+    sync of a process loads all unexpired revocations.
+    """
+    global _last_sync, _watermark
+    now = timezone.now()
+    revocations = RevokedToken.objects.filter(expires_at__gte=now)
+    if _watermark is not None:
+        revocations = revocations.filter(revoked_at__gte=_watermark - SYNC_OVERLAP)
+    revoked = revocations.values_list("jti", "expires_at")
+    with _revoked_lock:
+        _revoked.update(revoked)
+        for jti in [jti for jti, expires_at in _revoked.items() if expires_at < now]:
+            del _revoked[jti]
+        _watermark = now
+        _last_sync = time.monotonic()
+
+
+def is_revoked(token):
+    """
+    Returns True, if the refresh token was revoked. The check is done against the
+    revoked jtis in memory, so valid tokens don't need a query either. Revocations of
+    other processes are seen after at most TOKEN_REVOCATION_SYNC_INTERVAL seconds.
+    """
+    jti = token.get(api_settings.JTI_CLAIM)
+    if jti is None:
+        return False
+    if (_last_sync is None
+            or time.monotonic() - _last_sync >= settings.TOKEN_REVOCATION_SYNC_INTERVAL):
+        _sync()
+    with _revoked_lock:
+        return jti in _revoked
+
+
+def revoke(token):
+    """
+    Revokes the refresh token until it expires. Expired revocations are purged at most
+    once every TOKEN_REVOCATION_PURGE_INTERVAL seconds per process, so the table only
+    contains tokens, which would still be valid.
+    """
+    jti = token.get(api_settings.JTI_CLAIM)
+    if jti is None:
+        return
+    expires_at = datetime_from_epoch(token["exp"])
+    RevokedToken.objects.get_or_create(jti=jti, defaults={"expires_at": expires_at})
+    _remember(jti, expires_at)
+    if time.monotonic() - _last_purge >= settings.TOKEN_REVOCATION_PURGE_INTERVAL:
+        purge_expired()
+
+
+def purge_expired():
+    """
+    Removes all revocations of tokens, which have expired in the meantime.
+    """
+    global _last_purge
+    _last_purge = time.monotonic()
+    now = timezone.now()
+    RevokedToken.objects.filter(expires_at__lt=now).delete()
+    with _revoked_lock:
+        for jti in [jti for jti, expires_at in _revoked.items() if expires_at < now]:
+            del _revoked[jti]
@@ -0,0 +1,15 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from auth_app.authentication import invalidate_cached_user
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    """
+    Removes a changed or deleted user from the authentication cache, so the next
+    request of this process sees the current state (e.g. is_active or the password).
+    Without a shared cache, other processes see it once their entry expires.
+    """
+    invalidate_cached_user(instance.pk)
@@ -1,12 +1,31 @@
+import io
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
 from django.urls import reverse
 from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import override_settings
+from django.utils import timezone
 
 from rest_framework.test import APITestCase
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from auth_app import authentication, revocation
+from auth_app.api.serializers import RegistrationSerializer
+from auth_app.models import RevokedToken
+from quiz_app.tests import MEMORY_RESPONSE_CACHES
 
 
 class AuthTests(APITestCase):
     def setUp(self):
+        caches["throttle"].clear()
         self.user = User.objects.create_user(username="tester", email="tester.mail@test.com",
                                              password="test12345")
 
@@ -43,6 +62,83 @@ class AuthTests(APITestCase):
         response = self.client.post(url, data, format="json")
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_register_email_exists_with_different_case(self):
+        url = reverse("register")
+        data = {
+            "username": "testname",
+            "password": "test12345",
+            "confirmed_password": "test12345",
+            "email": "Tester.Mail@Test.com"
+        }
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["email"], ["Email already in use."])
+        self.assertFalse(User.objects.filter(username="testname").exists())
+
+    def test_register_username_taken_at_same_time(self):
+        serializer = RegistrationSerializer(data={"username": "racer", "password": "test12345",
+                                                  "confirmed_password": "test12345",
+                                                  "email": "racer@example.com"})
+        serializer.is_valid(raise_exception=True)
+        User.objects.create_user(username="racer", password="test12345")
+        with self.assertRaises(ValidationError) as context:
+            serializer.save()
+        self.assertIn("username", context.exception.detail)
+
+    def test_register_other_integrity_errors_are_raised(self):
+        serializer = RegistrationSerializer(data={"username": "testname", "password": "test12345",
+                                                  "confirmed_password": "test12345",
+                                                  "email": "other@example.com"})
+        serializer.is_valid(raise_exception=True)
+        with mock.patch("auth_app.api.serializers.User.objects.create_user",
+                        side_effect=IntegrityError("NOT NULL constraint failed: auth_user.email")):
+            with self.assertRaises(IntegrityError):
+                serializer.save()
+
+    def test_users_without_email_are_not_unique(self):
+        User.objects.create_user(username="first", password="test12345")
+        User.objects.create_user(username="second", password="test12345")
+        self.assertEqual(User.objects.filter(email="").count(), 2)
+
+    def test_register_users_command(self):
+        rows = ["username,email,password",
+                "student1,student1@school.com,secret123",
+                "student2,STUDENT1@school.com,secret123",
+                "tester,new@school.com,secret123",
+                "student3,Tester.Mail@test.com,secret123",
+                "student4,student4@school.com,",
+                "student5,student5@school.com,secret123"]
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as file:
+            file.write("\n".join(rows))
+        self.addCleanup(os.remove, file.name)
+        stdout = io.StringIO()
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=1000):
+            call_command("register_users", file.name, batch_size=2, workers=2, stdout=stdout)
+        self.assertIn("Registered 2 users, skipped 4.", stdout.getvalue())
+        self.assertIn("Skipped line 3: email STUDENT1@school.com already exists", stdout.getvalue())
+        student = User.objects.get(username="student5")
+        self.assertTrue(student.check_password("secret123"))
+        self.assertEqual(student.email, "student5@school.com")
+
+    def test_register_users_command_skips_invalid_rows(self):
+        rows = ["username,email,password",
+                "student 1,student1@school.com,secret123",
+                "student2,no-email,secret123",
+                f"{'s' * 151},student3@school.com,secret123",
+                "student4,student4@school.com,secret123"]
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as file:
+            file.write("\n".join(rows))
+        self.addCleanup(os.remove, file.name)
+        stdout = io.StringIO()
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=1000):
+            call_command("register_users", file.name, workers=1, stdout=stdout)
+        self.assertIn("Registered 1 users, skipped 3.", stdout.getvalue())
+        self.assertIn("Skipped line 2: username student 1 is invalid", stdout.getvalue())
+        self.assertIn("Skipped line 3: email no-email is invalid", stdout.getvalue())
+        self.assertIn("Skipped line 4: username", stdout.getvalue())
+        self.assertFalse(User.objects.filter(username__in=["student 1", "student2"]).exists())
+        self.assertTrue(User.objects.filter(username="student4").exists())
+
     def test_login_successfully(self):
         url = reverse("login")
         data = {
@@ -52,6 +148,19 @@ class AuthTests(APITestCase):
         response = self.client.post(url, data, format="json")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_login_looks_up_user_once(self):
+        url = reverse("login")
+        data = {
+            "username": "tester",
+            "password": "test12345"
+        }
+        with self.assertNumQueries(1):
+            response = self.client.post(url, data, format="json")
+        self.assertEqual(response.data["user"], {"id": self.user.pk, "username": "tester",
+                                                 "email": "tester.mail@test.com"})
+        self.assertIn("access_token", response.cookies)
+        self.assertIn("refresh_token", response.cookies)
+
     def test_login_not_successful(self):
         url = reverse("login")
         data = {
@@ -72,4 +181,217 @@ class AuthTests(APITestCase):
         url = reverse("logout")
         data = {}
         response = self.client.post(url, data)
-        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(QUIZ_RESPONSE_CACHE_TTL=0, CACHES=MEMORY_RESPONSE_CACHES)
+class CookieJWTAuthenticationCacheTests(APITestCase):
+    def setUp(self):
+        authentication._user_cache.clear()
+        self.addCleanup(authentication._user_cache.clear)
+        self.user = User.objects.create_user(username="tester", email="tester.mail@test.com",
+                                             password="test12345")
+        self.url = reverse("quiz-list")
+
+    def authenticate(self, user):
+        self.client.cookies["access_token"] = str(AccessToken.for_user(user))
+
+    def test_user_is_only_loaded_once(self):
+        self.authenticate(self.user)
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_deactivated_user_is_rejected(self):
+        self.authenticate(self.user)
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_user_is_rejected(self):
+        self.authenticate(self.user)
+        self.client.get(self.url)
+        self.user.delete()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(AUTH_USER_CACHE_MAX_ENTRIES=2)
+    def test_cache_size_is_limited(self):
+        for number in range(3):
+            user = User.objects.create_user(username=f"user{number}", password="test12345")
+            self.authenticate(user)
+            self.client.get(self.url)
+        expected = [str(User.objects.get(username=username).pk) for username in ("user1", "user2")]
+        self.assertEqual(list(authentication._user_cache), expected)
+
+    @override_settings(AUTH_USER_CACHE_TTL=0)
+    def test_cache_can_be_disabled(self):
+        self.authenticate(self.user)
+        self.client.get(self.url)
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+
+    @override_settings(AUTH_USER_CACHE_ALIAS="default")
+    def test_shared_cache_is_used(self):
+        caches["default"].clear()
+        self.addCleanup(caches["default"].clear)
+        self.authenticate(self.user)
+        self.client.get(self.url)
+        self.assertEqual(authentication._user_cache, {})
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class RefreshTokenTests(APITestCase):
+    def setUp(self):
+        caches["throttle"].clear()
+        authentication._user_cache.clear()
+        self.addCleanup(authentication._user_cache.clear)
+        revocation._revoked.clear()
+        revocation._last_sync = None
+        revocation._watermark = None
+        self.addCleanup(revocation._revoked.clear)
+        self.user = User.objects.create_user(username="tester", email="tester.mail@test.com",
+                                             password="test12345")
+        self.client.post(reverse("login"), {"username": "tester", "password": "test12345"},
+                         format="json")
+        self.refresh_token = self.client.cookies["refresh_token"].value
+
+    def test_refresh_successfully(self):
+        response = self.client.post(reverse("refresh"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        access = AccessToken(response.cookies["access_token"].value)
+        self.assertEqual(access["user_id"], str(self.user.pk))
+
+    def test_valid_token_is_refreshed_without_query(self):
+        self.client.post(reverse("refresh"))
+        with self.assertNumQueries(0):
+            response = self.client.post(reverse("refresh"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_refresh_invalid_token(self):
+        self.client.cookies["refresh_token"] = "invalid"
+        response = self.client.post(reverse("refresh"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_token_is_revoked_on_logout(self):
+        self.client.post(reverse("refresh"))
+        self.client.post(reverse("logout"))
+        self.assertEqual(RevokedToken.objects.count(), 1)
+        self.client.cookies["refresh_token"] = self.refresh_token
+        # Revocations of the own process are known without a query.
+        with self.assertNumQueries(0):
+            response = self.client.post(reverse("refresh"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revocation_of_other_process_is_found_after_sync(self):
+        self.client.post(reverse("refresh"))
+        self.client.post(reverse("logout"))
+        revocation._revoked.clear()
+        self.client.cookies["refresh_token"] = self.refresh_token
+        response = self.client.post(reverse("refresh"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        with override_settings(TOKEN_REVOCATION_SYNC_INTERVAL=0):
+            response = self.client.post(reverse("refresh"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_sync_only_loads_new_revocations(self):
+        revocation._sync()
+        RevokedToken.objects.create(jti="old", expires_at=timezone.now() + timedelta(days=1),
+                                    revoked_at=timezone.now() - timedelta(hours=1))
+        RevokedToken.objects.create(jti="new", expires_at=timezone.now() + timedelta(days=1))
+        revocation._sync()
+        self.assertNotIn("old", revocation._revoked)
+        self.assertIn("new", revocation._revoked)
+
+    def test_sync_drops_expired_revocations_from_memory(self):
+        revocation._remember("expired", timezone.now() - timedelta(seconds=1))
+        revocation._sync()
+        self.assertNotIn("expired", revocation._revoked)
+
+    def test_expired_revocations_are_purged(self):
+        RevokedToken.objects.create(jti="expired", expires_at=timezone.now() - timedelta(days=1))
+        revocation.purge_expired()
+        self.assertFalse(RevokedToken.objects.filter(jti="expired").exists())
+
+
+class ThrottlingTests(APITestCase):
+    def setUp(self):
+        caches["throttle"].clear()
+        self.addCleanup(caches["throttle"].clear)
+        self.user = User.objects.create_user(username="tester", email="tester.mail@test.com",
+                                             password="test12345")
+
+    def login(self, username, password="wrong"):
+        return self.client.post(reverse("login"), {"username": username, "password": password},
+                                format="json")
+
+    def test_login_is_throttled_per_username(self):
+        rates = {"login_ip": "100/min", "login_username": "3/min"}
+        with mock.patch("rest_framework.throttling.SimpleRateThrottle.THROTTLE_RATES", rates):
+            for _ in range(3):
+                self.assertEqual(self.login("Tester").status_code, status.HTTP_401_UNAUTHORIZED)
+            self.assertEqual(self.login("tester", "test12345").status_code,
+                             status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertEqual(self.login("other").status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_login_is_throttled_per_ip(self):
+        rates = {"login_ip": "3/min", "login_username": "100/min"}
+        with mock.patch("rest_framework.throttling.SimpleRateThrottle.THROTTLE_RATES", rates):
+            for number in range(3):
+                self.login(f"user{number}")
+            self.assertEqual(self.login("tester", "test12345").status_code,
+                             status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_login_with_list_body_is_rejected(self):
+        response = self.client.post(reverse("login"), [], format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_forwarded_for_header_does_not_bypass_throttle(self):
+        rates = {"login_ip": "3/min", "login_username": "100/min"}
+        with mock.patch("rest_framework.throttling.SimpleRateThrottle.THROTTLE_RATES", rates):
+            for number in range(3):
+                self.client.post(reverse("login"), {"username": f"user{number}", "password": "x"},
+                                 format="json", HTTP_X_FORWARDED_FOR=f"10.0.0.{number}")
+            response = self.client.post(reverse("login"), {"username": "tester", "password": "x"},
+                                        format="json", HTTP_X_FORWARDED_FOR="10.0.0.99")
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_registration_is_throttled_per_ip(self):
+        with mock.patch("rest_framework.throttling.SimpleRateThrottle.THROTTLE_RATES",
+                        {"registration": "1/hour"}):
+            self.client.post(reverse("register"), {}, format="json")
+            response = self.client.post(reverse("register"), {}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+
+class PasswordHasherTests(APITestCase):
+    def setUp(self):
+        caches["throttle"].clear()
+
+    @override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+    def test_password_is_rehashed_on_login_if_cost_changes(self):
+        user = User.objects.create_user(username="tester", password="test12345")
+        self.assertTrue(user.password.startswith("pbkdf2_sha256$1000$"))
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            response = self.client.post(reverse("login"),
+                                        {"username": "tester", "password": "test12345"},
+                                        format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith("pbkdf2_sha256$2000$"))
+
+    @override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+    def test_benchmark_login_command(self):
+        stdout = io.StringIO()
+        call_command("benchmark_login", logins=3, host="testserver", stdout=stdout)
+        self.assertIn("logins/s", stdout.getvalue())
+        self.assertFalse(User.objects.filter(username__startswith="login-benchmark-").exists())
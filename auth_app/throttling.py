@@ -0,0 +1,52 @@
+from collections.abc import Mapping
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class AuthRateThrottle(SimpleRateThrottle):
+    """
+    Base class of the throttles of the authentication endpoints. The request counts
+    are kept in the cache AUTH_THROTTLE_CACHE_ALIAS, a local memory cache by default,
+    so every process counts on its own. The client IP address is taken from
+    REMOTE_ADDR, or from X-Forwarded-For behind NUM_PROXIES proxies.
+    """
+    def __init__(self):
+        self.cache = caches[settings.AUTH_THROTTLE_CACHE_ALIAS]
+        super().__init__()
+
+
+class LoginIPThrottle(AuthRateThrottle):
+    """
+    Limits the login attempts per IP address.
+    """
+    scope = "login_ip"
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {"scope": self.scope, "ident": self.get_ident(request)}
+
+
+class LoginUsernameThrottle(AuthRateThrottle):
+    """
+    Limits the login attempts per username, so one account can't be attacked from
+    many IP addresses at once.
+    """
+    scope = "login_username"
+
+    def get_cache_key(self, request, view):
+        if not isinstance(request.data, Mapping):
+            return None
+        username = request.data.get("username")
+        if not isinstance(username, str) or not username:
+            return None
+        return self.cache_format % {"scope": self.scope, "ident": username.lower()}
+
+
+class RegistrationIPThrottle(AuthRateThrottle):
+    """
+    Limits the registrations per IP address.
+    """
+    scope = "registration"
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {"scope": self.scope, "ident": self.get_ident(request)}
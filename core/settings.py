@@ -85,12 +85,51 @@ WSGI_APPLICATION = 'core.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_ENGINE selects the database: sqlite (default) or postgresql.
+# SQLite runs in WAL mode, so readers don't block the writer, and waits up to
+# SQLITE_BUSY_TIMEOUT seconds for a lock instead of failing with "database is
+# locked". Transactions take the write lock at the start (IMMEDIATE), so two
+# workers can't deadlock while upgrading a read to a write.
+# PostgreSQL needs psycopg (pip install "psycopg[binary,pool]"). Connections are
+# kept open for DB_CONN_MAX_AGE seconds and checked before they are reused. With
+# DB_POOL=True a connection pool of DB_POOL_MIN_SIZE to DB_POOL_MAX_SIZE
+# connections per process is used instead.
+
+DB_ENGINE = os.getenv("DB_ENGINE", "sqlite")
+
+if DB_ENGINE == "postgresql":
+    DB_POOL = os.getenv("DB_POOL", "False") == "True"
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv("DB_NAME") or "quizly",
+            'USER': os.getenv("DB_USER", "quizly"),
+            'PASSWORD': os.getenv("DB_PASSWORD", ""),
+            'HOST': os.getenv("DB_HOST", "localhost"),
+            'PORT': os.getenv("DB_PORT", "5432"),
+            # Persistent connections can't be combined with the pool.
+            'CONN_MAX_AGE': 0 if DB_POOL else int(os.getenv("DB_CONN_MAX_AGE", "60")),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+                    'max_size': int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+                } if DB_POOL else False,
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv("DB_NAME") or BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': float(os.getenv("SQLITE_BUSY_TIMEOUT", "20")),
+            },
+        }
     }
-}
 
 
 # Password validation
@@ -111,6 +150,30 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing
+# PASSWORD_HASHER selects the hasher for new passwords: pbkdf2 (default),
+# argon2 (needs argon2-cffi) or bcrypt (needs bcrypt). Existing hashes of the other
+# hashers stay valid and are updated on the next successful login, also when
+# the cost settings change. Empty cost settings use the defaults of Django.
+
+PASSWORD_HASHER = os.getenv("PASSWORD_HASHER", "pbkdf2")
+PASSWORD_PBKDF2_ITERATIONS = int(os.getenv("PASSWORD_PBKDF2_ITERATIONS") or 0)
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST") or 0)
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST") or 0)
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS") or 0)
+
+_PASSWORD_HASHERS = {
+    "pbkdf2": 'auth_app.hashers.PBKDF2CostPasswordHasher',
+    "argon2": 'auth_app.hashers.Argon2CostPasswordHasher',
+    "bcrypt": 'auth_app.hashers.BCryptCostPasswordHasher',
+}
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASHER]] + [
+    hasher for name, hasher in _PASSWORD_HASHERS.items() if name != PASSWORD_HASHER
+] + [
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/6.0/topics/i18n/
@@ -138,11 +201,154 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': os.getenv("LOGIN_IP_RATE", "30/min"),
+        'login_username': os.getenv("LOGIN_USERNAME_RATE", "10/min"),
+        'registration': os.getenv("REGISTRATION_RATE", "20/hour"),
+    },
+    # Number of reverse proxies in front of the app. The throttles take the client
+    # IP address from X-Forwarded-For only behind that many proxies, otherwise
+    # clients could send a new X-Forwarded-For header with every request.
+    'NUM_PROXIES': int(os.getenv("NUM_PROXIES", "0")),
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'throttle': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'throttle',
+    },
+    'quiz_responses': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv("QUIZ_RESPONSE_CACHE_DIR") or BASE_DIR / '.cache' / 'quiz_responses',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
+# Authentication
+# Login and registration are rate limited per IP address and login also per
+# username (see DEFAULT_THROTTLE_RATES). The counts are kept in the cache
+# AUTH_THROTTLE_CACHE_ALIAS, which is local to the process by default: every
+# process counts on its own, so the effective limit is the rate times the number
+# of processes. Point the alias to a shared cache (e.g. Redis) to count across
+# processes.
+# Users resolved from access tokens are cached for AUTH_USER_CACHE_TTL seconds
+# (0 disables the cache), at most AUTH_USER_CACHE_MAX_ENTRIES per process.
+# Saving or deleting a user only clears the cache of the process, which made the
+# change. Other processes keep using the cached user (e.g. after a deactivation or
+# password change) for up to AUTH_USER_CACHE_TTL seconds, as do all processes after
+# QuerySet.update() or bulk_update(), which send no signals. Set
+# AUTH_USER_CACHE_ALIAS to the name of a shared cache in CACHES (e.g. Redis) to
+# share the cached users and their invalidation between processes.
+
+AUTH_THROTTLE_CACHE_ALIAS = os.getenv("AUTH_THROTTLE_CACHE_ALIAS", "throttle")
+AUTH_USER_CACHE_TTL = int(os.getenv("AUTH_USER_CACHE_TTL", "10"))
+AUTH_USER_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_USER_CACHE_MAX_ENTRIES", "1000"))
+AUTH_USER_CACHE_ALIAS = os.getenv("AUTH_USER_CACHE_ALIAS", "")
+
+# Refresh tokens are revoked on logout. Revocations of expired tokens are removed
+# at most every TOKEN_REVOCATION_PURGE_INTERVAL seconds. Every process keeps the
+# revoked tokens in memory and loads the new revocations at most every
+# TOKEN_REVOCATION_SYNC_INTERVAL seconds, so a logout in another process takes up
+# to that long to apply.
+
+TOKEN_REVOCATION_PURGE_INTERVAL = int(os.getenv("TOKEN_REVOCATION_PURGE_INTERVAL", "3600"))
+TOKEN_REVOCATION_SYNC_INTERVAL = int(os.getenv("TOKEN_REVOCATION_SYNC_INTERVAL", "5"))
+
+# Whisper
+# The model is loaded once per process. Set WHISPER_PRELOAD=True to load it
+# while the app starts instead of on the first transcription.
+
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "turbo")
+WHISPER_PRELOAD = os.getenv("WHISPER_PRELOAD", "False") == "True"
+
+# With more than one transcription worker, long audio is split into chunks of
+# about TRANSCRIPTION_CHUNK_SECONDS at silent parts, which are transcribed in
+# parallel by a pool of processes. Neighbouring chunks overlap by
+# TRANSCRIPTION_CHUNK_OVERLAP seconds.
+
+TRANSCRIPTION_WORKERS = int(os.getenv("TRANSCRIPTION_WORKERS", "1"))
+TRANSCRIPTION_CHUNK_SECONDS = int(os.getenv("TRANSCRIPTION_CHUNK_SECONDS", "300"))
+TRANSCRIPTION_CHUNK_OVERLAP = float(os.getenv("TRANSCRIPTION_CHUNK_OVERLAP", "2"))
+
+# Silent parts of at least VAD_MIN_SILENCE_SECONDS are removed before the
+# audio is transcribed. A part counts as silent, if its energy is below
+# VAD_THRESHOLD times the energy of the loud parts of the audio.
+
+VAD_ENABLED = os.getenv("VAD_ENABLED", "True") == "True"
+VAD_THRESHOLD = float(os.getenv("VAD_THRESHOLD", "0.05"))
+VAD_MIN_SILENCE_SECONDS = float(os.getenv("VAD_MIN_SILENCE_SECONDS", "1.0"))
+VAD_PADDING_SECONDS = float(os.getenv("VAD_PADDING_SECONDS", "0.2"))
+
+# Every quiz generation gets its own temporary directory for its audio files.
+# By default it is created in the temp directory of the system.
+# With AUDIO_STREAMING the audio is piped from yt-dlp into ffmpeg and decoded
+# in memory. Disable it to download the audio file into the directory instead.
+
+AUDIO_WORKSPACE_ROOT = os.getenv("AUDIO_WORKSPACE_ROOT") or None
+AUDIO_STREAMING = os.getenv("AUDIO_STREAMING", "True") == "True"
+
+# Quiz generation
+# QUIZ_LLM_BACKEND selects the LLM, which generates the quizzes:
+#   quiz_app.llm.GeminiBackend (default), quiz_app.llm.OpenAICompatibleBackend
+#   or quiz_app.llm.StubBackend (local fake for load tests, answers after
+#   QUIZ_STUB_LATENCY seconds).
+# Transcripts with more than QUIZ_TRANSCRIPT_TOKEN_BUDGET tokens are condensed,
+# before they are sent to Gemini.
+# Every LLM request times out after LLM_TIMEOUT seconds. Temporary errors are
+# retried up to LLM_MAX_RETRIES times with a jittered backoff of at most
+# LLM_RETRY_MAX_WAIT seconds. Each process sends at most LLM_MAX_CONCURRENCY
+# requests at the same time.
+# Missing or invalid questions of a generated quiz are requested again up to
+# QUIZ_REPAIR_ATTEMPTS times.
+# Generated quizzes are cached for QUIZ_CACHE_TTL seconds. Set it to 0 to
+# disable the cache. The least recently used quizzes are removed, as soon as
+# there are more than QUIZ_CACHE_MAX_ENTRIES.
+
+QUIZ_LLM_BACKEND = os.getenv("QUIZ_LLM_BACKEND", "quiz_app.llm.GeminiBackend")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-3-flash-preview")
+OPENAI_COMPATIBLE_BASE_URL = os.getenv("OPENAI_COMPATIBLE_BASE_URL", "https://api.openai.com/v1")
+OPENAI_COMPATIBLE_API_KEY = os.getenv("OPENAI_COMPATIBLE_API_KEY", "")
+OPENAI_COMPATIBLE_MODEL = os.getenv("OPENAI_COMPATIBLE_MODEL", "gpt-4o-mini")
+QUIZ_STUB_LATENCY = float(os.getenv("QUIZ_STUB_LATENCY", "0"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_MAX_WAIT = float(os.getenv("LLM_RETRY_MAX_WAIT", "30"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+QUIZ_REPAIR_ATTEMPTS = int(os.getenv("QUIZ_REPAIR_ATTEMPTS", "2"))
+QUIZ_TRANSCRIPT_TOKEN_BUDGET = int(os.getenv("QUIZ_TRANSCRIPT_TOKEN_BUDGET", "24000"))
+QUIZ_CACHE_TTL = int(os.getenv("QUIZ_CACHE_TTL", str(60 * 60 * 24 * 7)))
+QUIZ_CACHE_MAX_ENTRIES = int(os.getenv("QUIZ_CACHE_MAX_ENTRIES", "1000"))
+
+# Quiz responses
+# The quiz list and quiz details are cached per user for QUIZ_RESPONSE_CACHE_TTL
+# seconds in the cache QUIZ_RESPONSE_CACHE_ALIAS (0 disables it). The cache has
+# to be shared by the web and worker processes, because the workers create the
+# quizzes. By default it is stored in files in QUIZ_RESPONSE_CACHE_DIR (defaults
+# to .cache/quiz_responses in the project, only readable by its owner), set the
+# alias to a shared cache in CACHES (e.g. Redis), if the processes run on
+# different machines. Independent of the TTL, the responses have an ETag, so
+# unchanged quizzes are answered with 304.
+
+QUIZ_RESPONSE_CACHE_TTL = int(os.getenv("QUIZ_RESPONSE_CACHE_TTL", "300"))
+QUIZ_RESPONSE_CACHE_ALIAS = os.getenv("QUIZ_RESPONSE_CACHE_ALIAS", "quiz_responses")
+
+# Quiz generation jobs
+# Running jobs, which are not finished after this amount of seconds, are treated
+# as abandoned (e.g. crashed worker) and will be picked up again. Progress streams
+# (api/jobs/<id>/events/) are closed after the same time.
+
+GENERATION_JOB_TIMEOUT = int(os.getenv("GENERATION_JOB_TIMEOUT", "1800"))
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Quizly',
     'DESCRIPTION': 'Generate Quizzes based on YouTube links. It extracts the audio, converts it into text and lastly generates questions and answers based on the Gemini API',
     'VERSION': '1.0.0',
     'SERVE_INCLUDE_SCHEMA': False,
+    'POSTPROCESSING_HOOKS': [
+        'drf_spectacular.hooks.postprocess_schema_enums',
+        'quiz_app.api.schema.add_job_events_path',
+    ],
 }
@@ -1,8 +1,11 @@
 from django.contrib import admin
-from .models import Quiz, Question
+from .models import Quiz, Question, GenerationJob, Transcript, GeneratedQuiz
 
 # Register your models here.
 
 
 admin.site.register(Quiz)
 admin.site.register(Question)
+admin.site.register(GenerationJob)
+admin.site.register(Transcript)
+admin.site.register(GeneratedQuiz)
@@ -0,0 +1,21 @@
+from rest_framework.pagination import CursorPagination
+
+
+class QuizCursorPagination(CursorPagination):
+    """
+    Keyset pagination of the quiz list, newest quizzes first. Every page continues
+    after the last quiz of the previous one, so it is equally fast for every page and
+    does not skip or repeat quizzes, if quizzes are created in between.
+    The pagination is opt-in: it is only used, if the request contains the cursor or
+    page_size parameter. Otherwise all quizzes are returned as plain list, as before.
+    """
+    ordering = ("-created_at", "-id")
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if (self.cursor_query_param not in request.query_params
+                and self.page_size_query_param not in request.query_params):
+            return None
+        return super().paginate_queryset(queryset, request, view)
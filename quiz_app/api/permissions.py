@@ -16,12 +16,13 @@ class IsOwner(BasePermission):
     def has_object_permission(self, request, view, obj):
         """
         Only allows GET, PATCH and DELETE methods, if the provided used
-        is also the owner of the quiz.
+        is also the owner of the quiz. The ids are compared, so the user of the
+        quiz does not have to be loaded from the database.
         """
         if request.method == "GET":
-            return obj.user == request.user
+            return obj.user_id == request.user.id
         if request.method == "PATCH":
-            return obj.user == request.user
+            return obj.user_id == request.user.id
         if request.method == "DELETE":
-            return obj.user == request.user
+            return obj.user_id == request.user.id
         return False
\ No newline at end of file
@@ -0,0 +1,27 @@
+def add_job_events_path(result, generator, request, public):
+    """
+    Adds the Server-Sent Events stream of GenerationJobEventsView to the OpenAPI schema.
+    It is an async Django view and not a DRF view, so drf-spectacular doesn't find it.
+    The paths are sorted again, like drf-spectacular does.
+    """
+    paths = result["paths"]
+    paths["/api/jobs/{id}/events/"] = {
+        "get": {
+            "operationId": "jobs_events_retrieve",
+            "description": "Authentication required. Streams the progress of a quiz generation job as Server-Sent Events. Every time the stage or progress changes, an event named after the stage (downloading, transcribing, generating, saved) is sent, or failed if the generation fails. The data of an event contains id, status, stage, progress, error and quiz of the job. The stream ends when the job is done or failed, or after GENERATION_JOB_TIMEOUT seconds. Clients reconnect after the retry interval sent at the start of the stream.",
+            "parameters": [
+                {"in": "path", "name": "id", "schema": {"type": "integer"}, "required": True},
+            ],
+            "tags": ["jobs"],
+            "responses": {
+                "200": {
+                    "content": {"text/event-stream": {"schema": {"type": "string"}}},
+                    "description": "",
+                },
+                "401": {"description": "Authentication credentials were not provided."},
+                "404": {"description": "No GenerationJob matches the given query."},
+            },
+        },
+    }
+    result["paths"] = dict(sorted(paths.items()))
+    return result
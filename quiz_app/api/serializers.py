@@ -1,14 +1,19 @@
 import re
+from django.db import transaction
 from rest_framework import serializers
-from quiz_app.models import Quiz, Question
+from quiz_app.caching import invalidate_quizzes
+from quiz_app.models import Quiz, Question, GenerationJob
 
 
 class YouTubeURLSerializer(serializers.Serializer):
     """
     This serializer is only used for validating the provided url.
     It also extracts the video ID with the help of regex.
+    If force_regenerate is set, a new quiz is generated even if the video was
+    already used for a quiz before.
     """
     url = serializers.URLField(allow_blank=False, required=True)
+    force_regenerate = serializers.BooleanField(default=False, required=False)
 
     def validate_url(self, value):
         regex = re.compile(
@@ -57,6 +62,39 @@ class CreateQuestionSerializer(serializers.ModelSerializer):
         )
 
 
+class CreateQuizListSerializer(serializers.ListSerializer):
+    """
+    Used with CreateQuizSerializer(many=True) to import many quizzes at once.
+    """
+    def create(self, validated_data):
+        return self.create_quizzes(validated_data)
+
+    @staticmethod
+    def create_quizzes(validated_data):
+        """
+        Saves the quizzes with their questions in one transaction. All quizzes and all
+        questions are inserted with one bulk insert each, instead of one INSERT per row.
+        Bulk inserts don't send signals, so the cached quiz responses are invalidated
+        here, after the commit (see quiz_app.signals).
+        """
+        quizzes = [Quiz(user=quiz_data.get("user"),
+                        title=quiz_data.get("title"),
+                        description=quiz_data.get("description"),
+                        video_url=quiz_data.get("video_url"))
+                   for quiz_data in validated_data]
+        with transaction.atomic():
+            Quiz.objects.bulk_create(quizzes)
+            Question.objects.bulk_create([
+                Question(quiz=quiz, question_title=question.get("question_title"),
+                         question_options=question.get("question_options"),
+                         answer=question.get("answer"))
+                for quiz, quiz_data in zip(quizzes, validated_data)
+                for question in quiz_data.get("questions")
+            ])
+            transaction.on_commit(lambda: invalidate_quizzes(quizzes))
+        return quizzes
+
+
 class CreateQuizSerializer(serializers.ModelSerializer):
 
     questions = CreateQuestionSerializer(many=True)
@@ -66,6 +104,7 @@ class CreateQuizSerializer(serializers.ModelSerializer):
         fields = ["id", "title", "description", "created_at",
                   "updated_at", "video_url", "questions"]
         read_only_fields = ["id", "created_at", "updated_at"]
+        list_serializer_class = CreateQuizListSerializer
 
     def validate_description(self, value):
         """
@@ -91,21 +130,10 @@ class CreateQuizSerializer(serializers.ModelSerializer):
         """
         Custom create method. Has to be done, or the nested writing (questions)
         into the database would not be possible.
+        The quiz and its questions are written in one transaction, the questions with
+        a single bulk insert, so a quiz is never saved without its questions.
         """
-        user = validated_data.get("user")
-        quiz_title = validated_data.get("title")
-        quiz_description = validated_data.get("description")
-        quiz_video_url = validated_data.get("video_url")
-        quiz = Quiz.objects.create(user=user,
-                                   title=quiz_title,
-                                   description=quiz_description,
-                                   video_url=quiz_video_url)
-        for question in validated_data.get("questions"):
-            Question.objects.create(quiz=quiz, question_title=question.get("question_title"),
-                                    question_options=question.get(
-                                        "question_options"),
-                                    answer=question.get("answer"))
-        return quiz
+        return CreateQuizListSerializer.create_quizzes([validated_data])[0]
 
 
 class ListRetrieveQuestionSerializer(serializers.ModelSerializer):
@@ -137,3 +165,27 @@ class ListRetrieveUpdateQuizSerializer(serializers.ModelSerializer):
                 "error": "Only quiz title and description can be updated via PATCH."
             })
         return attrs
+
+
+class QuizSummarySerializer(serializers.ModelSerializer):
+    """
+    Lightweight representation of a quiz for the quiz list (?fields=summary),
+    without the questions.
+    """
+    class Meta:
+        model = Quiz
+        fields = ["id", "title", "description", "created_at"]
+        read_only_fields = fields
+
+
+class GenerationJobSerializer(serializers.ModelSerializer):
+    """
+    Shows the status of a quiz generation. As soon as the job is done,
+    the generated quiz is included.
+    """
+    quiz = ListRetrieveUpdateQuizSerializer(read_only=True)
+
+    class Meta:
+        model = GenerationJob
+        fields = ["id", "video_id", "force_regenerate", "status", "stage", "progress", "error", "quiz", "created_at", "updated_at"]
+        read_only_fields = fields
@@ -1,8 +1,11 @@
 from django.urls import path
-from .views import QuizCreateView, QuizListView, QuizRetrieveUpdateDestroyView
+from .views import (QuizCreateView, QuizListView, QuizRetrieveUpdateDestroyView, GenerationJobDetailView,
+                    GenerationJobEventsView)
 
 urlpatterns = [
     path("createQuiz/", QuizCreateView.as_view(), name="create-quiz"),
     path("quizzes/", QuizListView.as_view(), name="quiz-list"),
-    path("quizzes/<int:pk>/", QuizRetrieveUpdateDestroyView.as_view(), name="quiz-detail")
+    path("quizzes/<int:pk>/", QuizRetrieveUpdateDestroyView.as_view(), name="quiz-detail"),
+    path("jobs/<int:pk>/", GenerationJobDetailView.as_view(), name="job-detail"),
+    path("jobs/<int:pk>/events/", GenerationJobEventsView.as_view(), name="job-events")
 ]
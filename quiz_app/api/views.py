@@ -1,15 +1,29 @@
-import os
+import asyncio
+import json
+import time
+from asgiref.sync import sync_to_async
 from dotenv import load_dotenv
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.db.models import Prefetch
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers, quote_etag)
+from django.utils.http import http_date
+from django.views import View
 from rest_framework.views import APIView
-from rest_framework.generics import ListAPIView, RetrieveUpdateDestroyAPIView
+from rest_framework.generics import ListAPIView, RetrieveAPIView, RetrieveUpdateDestroyAPIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
-from drf_spectacular.utils import extend_schema, extend_schema_view
-from .serializers import YouTubeURLSerializer, CreateQuizSerializer, ListRetrieveUpdateQuizSerializer
+from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiParameter
+from .serializers import (YouTubeURLSerializer, ListRetrieveUpdateQuizSerializer,
+                          QuizSummarySerializer, GenerationJobSerializer)
+from .pagination import QuizCursorPagination
 from .permissions import IsOwner
-from quiz_app.models import Quiz
-from quiz_app.functions import download_audio, transcribe_audio, create_quiz
+from quiz_app.caching import (get_list_etag, get_cached_list, cache_list, get_cached_quiz_detail,
+                              cache_quiz_detail)
+from quiz_app.models import Quiz, Question, GenerationJob
+from auth_app.authentication import CookieJWTAuthentication
 
 load_dotenv()
 
@@ -17,67 +31,174 @@ load_dotenv()
 class QuizCreateView(APIView):
 
     @extend_schema(
-        description="Authentication required. Creates a Quiz in multiple steps. Step 1: Extracts audio from YouTube video. Step 2: Transcribes the audio into text. Step 3: Takes the generated text and inputs it into Gemini API to create a Quiz.",
+        description="Authentication required. Queues a quiz generation and returns the job. The quiz is created in multiple steps by a worker. Step 1: Extracts audio from YouTube video. Step 2: Transcribes the audio into text. Step 3: Takes the generated text and inputs it into Gemini API to create a Quiz. Poll the job via api/jobs/<id>/ to get the quiz. Quizzes for already used videos are reused, unless force_regenerate is set.",
         request=YouTubeURLSerializer,
-        responses={201: CreateQuizSerializer}
+        responses={202: GenerationJobSerializer}
     )
     def post(self, req):
         """
-        This method does multiple things:
-            -1. Validates and extracts the YouTube video ID
-            -2. Removes old audio files and calls the download_audio method to retrieve a new audio file
-            -3. Calls the transcribe method to retrieve the transcript.
-            -4. Call the create_quiz() method to genereate the quiz.
-            -5. After creating the quiz, it calls the serializer for validation.
-            -6. If valid, it saves the quiz to the database and returns the quiz data. 
+        Validates and extracts the YouTube video ID and queues a generation job for it.
+        The download, transcription and quiz generation are done by the quiz worker
+        (see the run_quiz_worker command), so the request returns immediately.
         """
         url_serializer = YouTubeURLSerializer(data=req.data)
-        if url_serializer.is_valid(raise_exception=True):
-            data = url_serializer.validated_data
-        if os.path.isdir("quiz_app/audio"):
-            if os.path.isfile("quiz_app/audio/audio.aac"):
-                os.remove("quiz_app/audio/audio.aac")
-        else:
-            os.makedirs("quiz_app/audio")
-        try:
-            download_audio(data.get("url"))
-        except: 
-            return Response("Failed to download audio. Check URL.",
-                            status=status.HTTP_400_BAD_REQUEST)
-        try:
-            transcription_result = transcribe_audio()
-        except:
-            return Response("Failed to transcribe audio. Please try again.",
-                            status=status.HTTP_400_BAD_REQUEST)
-        try:
-            generated_quiz = create_quiz(transcription_result)
-        except:
-            return Response("Failed to generate quiz. Please try again.",
-                            status=status.HTTP_400_BAD_REQUEST)
-        quiz_information_dict = {
-            "title": generated_quiz.get("title"),
-            "description": generated_quiz.get("description"),
-            "video_url": f"https://www.youtube.com/watch?v={data.get('url')}",
-            "questions": generated_quiz.get("questions")
-        }
-        quiz_serializer = CreateQuizSerializer(data=quiz_information_dict)
-        if quiz_serializer.is_valid(raise_exception=True):
-            quiz_serializer.save(user=req.user)
-            return Response(quiz_serializer.data, status=status.HTTP_201_CREATED)
-        return Response(quiz_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        url_serializer.is_valid(raise_exception=True)
+        data = url_serializer.validated_data
+        job = GenerationJob.objects.create(user=req.user, video_id=data.get("url"),
+                                           force_regenerate=data.get("force_regenerate"))
+        return Response(GenerationJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+@extend_schema(
+    description="Authentication required. Returns the status of a quiz generation job. Contains the quiz, as soon as the status is done. The progress can also be streamed as Server-Sent Events via api/jobs/<id>/events/."
+)
+class GenerationJobDetailView(RetrieveAPIView):
+    serializer_class = GenerationJobSerializer
+
+    def get_queryset(self):
+        """
+        Return only jobs that belong to the authenticated user.
+        """
+        return (GenerationJob.objects.filter(user=self.request.user)
+                .select_related("quiz").prefetch_related("quiz__questions"))
+
+
+class GenerationJobEventsView(View):
+    """
+    Streams the progress of a quiz generation job as Server-Sent Events.
+    Every time the stage or progress of the job changes, an event named after the
+    stage (downloading, transcribing, generating, saved) is sent. If the generation
+    fails, a failed event is sent. The stream ends when the job is done or failed,
+    or after GENERATION_JOB_TIMEOUT seconds, e.g. if no worker picks the job up.
+    Clients reconnect after retry_interval milliseconds to continue.
+    This is an async view, so an open stream only holds a cheap connection when the
+    app is served with an ASGI server.
+    """
+    poll_interval = 0.5
+    keepalive_interval = 15
+    retry_interval = 3000
+
+    async def get(self, request, pk):
+        authentication = await sync_to_async(CookieJWTAuthentication().authenticate)(request)
+        if authentication is None:
+            return JsonResponse({"detail": "Authentication credentials were not provided."},
+                                status=status.HTTP_401_UNAUTHORIZED)
+        user = authentication[0]
+        if not await GenerationJob.objects.filter(pk=pk, user=user).aexists():
+            return JsonResponse({"detail": "No GenerationJob matches the given query."},
+                                status=status.HTTP_404_NOT_FOUND)
+        response = StreamingHttpResponse(self.stream_events(pk),
+                                         content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    async def stream_events(self, pk):
+        """
+        Polls the job and yields an event, whenever its state has changed.
+        The stream starts with the reconnection delay for the client.
+        A keepalive comment is sent regularly, so proxies don't close the connection.
+        """
+        last_state = None
+        last_sent = started = time.monotonic()
+        yield f"retry: {self.retry_interval}\n\n"
+        while True:
+            job = await (GenerationJob.objects
+                         .filter(pk=pk)
+                         .values("id", "status", "stage", "progress", "error", "quiz")
+                         .afirst())
+            if job is None:
+                return
+            finished = job["status"] in (GenerationJob.Status.DONE, GenerationJob.Status.FAILED)
+            state = (job["status"], job["stage"], job["progress"])
+            if state != last_state:
+                event = "failed" if job["status"] == GenerationJob.Status.FAILED else job["stage"]
+                yield f"event: {event}\ndata: {json.dumps(job)}\n\n"
+                last_state = state
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= self.keepalive_interval:
+                yield ": keepalive\n\n"
+                last_sent = time.monotonic()
+            if finished or time.monotonic() - started >= settings.GENERATION_JOB_TIMEOUT:
+                return
+            await asyncio.sleep(self.poll_interval)
+
+
+def quizzes_with_questions():
+    """
+    Returns a queryset of quizzes, which loads the questions of all quizzes with one
+    additional query, instead of one query per quiz. Only the columns needed by
+    ListRetrieveUpdateQuizSerializer are selected.
+    """
+    questions = Question.objects.only("id", "quiz_id", "question_title", "question_options",
+                                      "answer").order_by("id")
+    return (Quiz.objects
+            .only("id", "user_id", "title", "description", "created_at", "updated_at",
+                  "video_url")
+            .prefetch_related(Prefetch("questions", queryset=questions)))
+
+
+def with_validators(response, etag, last_modified=None):
+    """
+    Adds the ETag and Last-Modified headers to the response, so clients can send
+    If-None-Match or If-Modified-Since and get a 304 if nothing has changed.
+    The responses depend on the user, so only the browser may store them and it has
+    to revalidate them on every use.
+    """
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ["Cookie"])
+    return response
 
 
 @extend_schema(
-    description="Authentication required. Returns a list of all quizzes that the authenticated users has created."
+    description="Authentication required. Returns a list of all quizzes that the authenticated users has created. With page_size or cursor the list is paginated, newest quizzes first. Follow the next link to get the next page. With fields=summary only id, title, description and created_at of every quiz are returned.",
+    parameters=[
+        OpenApiParameter("fields", str, enum=["summary"],
+                         description="Return only id, title, description and created_at."),
+    ]
 )
 class QuizListView(ListAPIView):
     serializer_class = ListRetrieveUpdateQuizSerializer
+    pagination_class = QuizCursorPagination
+
+    def is_summary(self):
+        return self.request.query_params.get("fields") == "summary"
+
+    def get_serializer_class(self):
+        if self.is_summary():
+            return QuizSummarySerializer
+        return super().get_serializer_class()
 
     def get_queryset(self):
         """
-        Return only quizzes that belong to the authenticated user.
+        Return only quizzes that belong to the authenticated user, newest first.
+        The ordering matches the quiz_user_created_idx index, so the database does not
+        have to sort. In summary mode the questions are not loaded.
         """
-        return Quiz.objects.filter(user=self.request.user)
+        if self.is_summary():
+            quizzes = Quiz.objects.only("id", "title", "description", "created_at")
+        else:
+            quizzes = quizzes_with_questions()
+        return quizzes.filter(user=self.request.user).order_by("-created_at", "-id")
+
+    def list(self, request, *args, **kwargs):
+        """
+        The ETag changes whenever a quiz of the user is created, changed or deleted
+        (see quiz_app.signals). Until then a matching If-None-Match is answered with 304
+        without any query and the serialized list is served from the cache.
+        """
+        etag = get_list_etag(request.user.id, request.build_absolute_uri())
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            data = get_cached_list(request.user.id, etag)
+            if data is None:
+                data = super().list(request, *args, **kwargs).data
+                cache_list(request.user.id, etag, data)
+            response = Response(data)
+        return with_validators(response, etag)
 
 
 @extend_schema_view(
@@ -96,5 +217,22 @@ class QuizListView(ListAPIView):
 )
 class QuizRetrieveUpdateDestroyView(RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated, IsOwner]
-    queryset = Quiz.objects.all()
+    queryset = quizzes_with_questions()
     serializer_class = ListRetrieveUpdateQuizSerializer
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Serves the quiz from the cache, if the user is its owner. Otherwise the quiz is
+        loaded, which also checks the permissions. The ETag and Last-Modified headers
+        are derived from updated_at of the quiz.
+        """
+        entry = get_cached_quiz_detail(kwargs["pk"])
+        if entry is None or entry["user_id"] != request.user.id:
+            quiz = self.get_object()
+            entry = cache_quiz_detail(quiz, self.get_serializer(quiz).data)
+        etag = quote_etag(f"{kwargs['pk']}-{entry['updated_at']}")
+        last_modified = int(entry["updated_at"])
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = Response(entry["data"])
+        return with_validators(response, etag, last_modified)
@@ -1,5 +1,16 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class QuizAppConfig(AppConfig):
     name = 'quiz_app'
+
+    def ready(self):
+        """
+        Connects the signals, which keep the cached quiz responses up to date, and
+        preloads the whisper model on startup, if WHISPER_PRELOAD is enabled.
+        """
+        from . import signals  # noqa: F401
+        if settings.WHISPER_PRELOAD:
+            from .functions import get_whisper_model
+            get_whisper_model()
@@ -0,0 +1,86 @@
+import hashlib
+import uuid
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import quote_etag
+
+
+def _cache():
+    return caches[settings.QUIZ_RESPONSE_CACHE_ALIAS]
+
+
+def get_list_version(user_id):
+    """
+    Returns the current version of the quiz list of the user. It changes every time
+    one of the quizzes of the user is created, changed or deleted (see bump_list_version),
+    so it is part of the ETag of the list.
+    """
+    return _cache().get_or_set(f"quiz-list-version:{user_id}", uuid.uuid4().hex, None)
+
+
+def bump_list_version(user_id):
+    """
+    Gives the quiz list of the user a new version. Cached lists of the old version are
+    not used anymore and expire. A random version is used instead of a counter, so a
+    version can't repeat, even if the cache entry was evicted in between.
+    """
+    _cache().set(f"quiz-list-version:{user_id}", uuid.uuid4().hex, None)
+
+
+def get_list_etag(user_id, variant):
+    """
+    Returns the ETag of the quiz list of the user. It is derived from the list version
+    and the variant, which contains everything else the response depends on
+    (e.g. the host and the page and fields parameters).
+    """
+    version = get_list_version(user_id)
+    return quote_etag(hashlib.sha256(f"{version}\n{variant}".encode("utf-8")).hexdigest()[:32])
+
+
+def get_cached_list(user_id, etag):
+    if settings.QUIZ_RESPONSE_CACHE_TTL <= 0:
+        return None
+    return _cache().get(f"quiz-list:{user_id}:{etag}")
+
+
+def cache_list(user_id, etag, data):
+    if settings.QUIZ_RESPONSE_CACHE_TTL > 0:
+        _cache().set(f"quiz-list:{user_id}:{etag}", data, settings.QUIZ_RESPONSE_CACHE_TTL)
+
+
+def get_cached_quiz_detail(quiz_id):
+    """
+    Returns the cached detail entry of the quiz: a dict with the user_id of the owner,
+    the updated_at timestamp and the serialized data. Returns None if it is not cached.
+    """
+    if settings.QUIZ_RESPONSE_CACHE_TTL <= 0:
+        return None
+    return _cache().get(f"quiz-detail:{quiz_id}")
+
+
+def cache_quiz_detail(quiz, data):
+    """
+    Caches the serialized data of the quiz and returns the cache entry.
+    """
+    entry = {"user_id": quiz.user_id, "updated_at": quiz.updated_at.timestamp(), "data": data}
+    if settings.QUIZ_RESPONSE_CACHE_TTL > 0:
+        _cache().set(f"quiz-detail:{quiz.pk}", entry, settings.QUIZ_RESPONSE_CACHE_TTL)
+    return entry
+
+
+def invalidate_quiz(quiz_id, user_id):
+    """
+    Removes the cached detail of the quiz and gives the quiz list of its owner a new
+    version (see quiz_app.signals).
+    """
+    _cache().delete(f"quiz-detail:{quiz_id}")
+    bump_list_version(user_id)
+
+
+def invalidate_quizzes(quizzes):
+    """
+    Like invalidate_quiz for many quizzes, e.g. after a bulk insert.
+    """
+    _cache().delete_many([f"quiz-detail:{quiz.pk}" for quiz in quizzes])
+    for user_id in {quiz.user_id for quiz in quizzes}:
+        bump_list_version(user_id)
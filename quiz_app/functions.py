@@ -1,65 +1,304 @@
 import yt_dlp
 import whisper
+import hashlib
+import importlib
 import json
-from google import genai
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import numpy as np
+import tqdm
+from contextlib import contextmanager
+from types import SimpleNamespace
+from django.conf import settings
+from quiz_app.llm import (QUIZ_PROMPT_VERSION, QUIZ_SCHEMA, QUESTIONS_SCHEMA, build_prompt,
+                          build_questions_prompt, get_backend)
 
 
-def download_audio(id):
+# Size of the passages a long transcript is split into, before it is condensed.
+TRANSCRIPT_PASSAGE_TOKENS = 200
+TRANSCRIPT_PASSAGE_SEPARATOR = " [...] "
+
+_whisper_models = {}
+_whisper_models_lock = threading.Lock()
+_transcription_progress = threading.local()
+# Number of transcriptions, which currently use the progress bar, and the original
+# tqdm module of whisper (see progress_bar_installed).
+_progress_bar_users = 0
+_original_whisper_tqdm = None
+_progress_bar_lock = threading.Lock()
+
+
+class _TranscriptionProgressBar(tqdm.tqdm):
+    """
+    Replaces the progress bar of whisper while transcribe_audio runs (see
+    progress_bar_installed). Whisper updates
+    it after every decoded segment. Instead of printing, it reports the progress to
+    the callback of the transcription that runs in the current thread.
+    """
+    def update(self, n=1):
+        result = super().update(n)
+        if self.disable:
+            # Whisper disables the bar unless verbose is False and a disabled tqdm
+            # does not count.
+            self.n += n
+        callback = getattr(_transcription_progress, "callback", None)
+        if callback is not None and self.total:
+            callback(min(100.0, 100.0 * self.n / self.total))
+        return result
+
+
+@contextmanager
+def progress_bar_installed():
+    """
+    Installs _TranscriptionProgressBar as the progress bar of whisper while the block
+    runs. The attribute is process-wide, so it is installed by the first of several
+    concurrent transcriptions and only restored by the last one. Other users of
+    whisper in the meantime get it as well, for them it behaves like the normal tqdm
+    bar, because there is no callback in their thread.
+    """
+    global _progress_bar_users, _original_whisper_tqdm
+    whisper_transcribe = importlib.import_module("whisper.transcribe")
+    with _progress_bar_lock:
+        if _progress_bar_users == 0:
+            _original_whisper_tqdm = whisper_transcribe.tqdm
+            whisper_transcribe.tqdm = SimpleNamespace(tqdm=_TranscriptionProgressBar)
+        _progress_bar_users += 1
+    try:
+        yield
+    finally:
+        with _progress_bar_lock:
+            _progress_bar_users -= 1
+            if _progress_bar_users == 0:
+                whisper_transcribe.tqdm = _original_whisper_tqdm
+
+
+def get_whisper_model(name=None):
+    """
+    Returns the whisper model with the given name (defaults to settings.WHISPER_MODEL).
+    Every model is only loaded once per process and then reused, because loading it
+    from disk takes several seconds and a lot of memory.
+    Returns a tuple of the model and a lock, which has to be held while transcribing,
+    because whisper installs hooks on the model during decoding.
+    """
+    name = name or settings.WHISPER_MODEL
+    entry = _whisper_models.get(name)
+    if entry is None:
+        with _whisper_models_lock:
+            entry = _whisper_models.get(name)
+            if entry is None:
+                entry = (whisper.load_model(name), threading.Lock())
+                _whisper_models[name] = entry
+    return entry
+
+
+@contextmanager
+def audio_workspace():
+    """
+    Creates a temporary directory for the audio files of one quiz generation and
+    yields its path. The directory and all files in it are removed afterwards, even if
+    the generation fails. Every generation gets its own directory, so several
+    generations can run at the same time without overwriting each others audio.
+    """
+    with tempfile.TemporaryDirectory(prefix="quizly-", dir=settings.AUDIO_WORKSPACE_ROOT,
+                                     ignore_cleanup_errors=True) as workspace:
+        yield workspace
+
+
+def download_audio(id, workspace, progress_callback=None):
     """
     Downloads an audio file from a specific youtube video, wich is provided with the url as 
-    the id parameter.
+    the id parameter, into the given workspace directory. Returns the path of the file.
+    The progress_callback is called with the downloaded percentage.
     """
     url = f"https://www.youtube.com/watch?v={id}"
-    tmp_filename = "quiz_app/audio/audio.aac"
+    tmp_filename = os.path.join(workspace, "audio.aac")
+
+    def report_progress(info):
+        total = info.get("total_bytes") or info.get("total_bytes_estimate")
+        if progress_callback is not None and info.get("status") == "downloading" and total:
+            progress_callback(min(100.0, 100.0 * info.get("downloaded_bytes", 0) / total))
+
     ydl_opts = {
         "format": "bestaudio/best",
         "outtmpl": tmp_filename,
         "quiet": True,
         "noplaylist": True,
+        "progress_hooks": [report_progress],
     }
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        error_code = ydl.download(url)
+        ydl.download(url)
+    return tmp_filename
 
 
-def transcribe_audio():
+def stream_audio(id, workspace, progress_callback=None):
+    """
+    Streams the audio of a specific youtube video into memory and returns it as
+    16 kHz mono waveform (float32 numpy array), the format whisper works with.
+    yt-dlp writes the audio into a pipe and ffmpeg decodes it while it is downloaded,
+    so the audio file is never written to disk and decoded a second time.
+    Only the video information is stored in the given workspace directory.
+    The progress_callback is called with the percentage of the decoded audio.
+    """
+    url = f"https://www.youtube.com/watch?v={id}"
+    with yt_dlp.YoutubeDL({"quiet": True, "noplaylist": True}) as ydl:
+        info = ydl.sanitize_info(ydl.extract_info(url, download=False))
+    info_path = os.path.join(workspace, "info.json")
+    with open(info_path, "w", encoding="utf-8") as file:
+        json.dump(info, file)
+
+    download = subprocess.Popen(
+        [sys.executable, "-m", "yt_dlp", "--load-info-json", info_path,
+         "--format", "bestaudio/best", "--quiet", "--no-progress", "--output", "-"],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    decode = subprocess.Popen(
+        ["ffmpeg", "-nostdin", "-threads", "0", "-i", "pipe:0", "-f", "s16le", "-ac", "1",
+         "-acodec", "pcm_s16le", "-ar", str(whisper.audio.SAMPLE_RATE), "-"],
+        stdin=download.stdout, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    download.stdout.close()
+
+    duration = info.get("duration")
+    bytes_per_second = whisper.audio.SAMPLE_RATE * 2
+    chunks = []
+    decoded_bytes = 0
+    try:
+        while chunk := decode.stdout.read(bytes_per_second * 10):
+            chunks.append(chunk)
+            decoded_bytes += len(chunk)
+            if progress_callback is not None and duration:
+                progress_callback(min(100.0, 100.0 * decoded_bytes / bytes_per_second / duration))
+    finally:
+        decode.stdout.close()
+        download_code = download.wait()
+        decode_code = decode.wait()
+    if download_code != 0 or decode_code != 0 or decoded_bytes == 0:
+        raise RuntimeError(f"Failed to stream audio of video {id}.")
+    return np.frombuffer(b"".join(chunks), np.int16).astype(np.float32) / 32768.0
+
+
+def transcribe_audio(audio, progress_callback=None):
     """
     Transcribes the generated audio from the YouTube video
-    into text format.
+    into text format. The audio can either be the path of an audio file or the
+    waveform returned by stream_audio. The progress_callback is called with the
+    transcribed percentage after every segment.
     """
-    model = whisper.load_model("turbo")
-    result = model.transcribe("quiz_app/audio/audio.aac", fp16=False)
+    model, lock = get_whisper_model()
+    with lock, progress_bar_installed():
+        _transcription_progress.callback = progress_callback
+        try:
+            result = model.transcribe(audio, fp16=False)
+        finally:
+            _transcription_progress.callback = None
     return result
 
 
-def create_quiz(transcript):
+def split_into_passages(text, encoding, passage_tokens=TRANSCRIPT_PASSAGE_TOKENS):
+    """
+    Splits the text into passages of whole sentences with up to passage_tokens tokens.
+    Sentences which are longer than that on their own are split by tokens.
+    Returns a list of (passage, token_count) tuples.
+    """
+    passages = []
+    current, current_tokens = [], 0
+    for sentence in re.split(r"(?<=[.!?])\s+", text):
+        tokens = encoding.encode(sentence)
+        if len(tokens) > passage_tokens:
+            pieces = [tokens[i:i + passage_tokens] for i in range(0, len(tokens), passage_tokens)]
+        else:
+            pieces = [tokens]
+        for piece in pieces:
+            if current and current_tokens + len(piece) > passage_tokens:
+                passages.append((" ".join(current), current_tokens))
+                current, current_tokens = [], 0
+            current.append(sentence if piece is tokens else encoding.decode(piece))
+            current_tokens += len(piece)
+    if current:
+        passages.append((" ".join(current), current_tokens))
+    return passages
+
+
+def prepare_transcript(transcript, token_budget=None):
+    """
+    Returns the text of the transcript (text or whisper result), which is sent to
+    Gemini. If it has more tokens than token_budget (defaults to
+    settings.QUIZ_TRANSCRIPT_TOKEN_BUDGET), it is condensed: the transcript is split
+    into passages and passages evenly spread over the whole transcript are kept, until
+    the budget is used up. So the prompt stays small, while the quiz still covers the
+    whole video. Tokens are counted with tiktoken.
+    """
+    if isinstance(transcript, dict):
+        transcript = transcript.get("text", "")
+    text = " ".join(transcript.split())
+    token_budget = token_budget or settings.QUIZ_TRANSCRIPT_TOKEN_BUDGET
+    encoding = whisper.tokenizer.get_encoding("multilingual")
+    if len(encoding.encode(text)) <= token_budget:
+        return text
+
+    passages = split_into_passages(text, encoding)
+    separator_tokens = len(encoding.encode(TRANSCRIPT_PASSAGE_SEPARATOR))
+    count = max(1, min(len(passages),
+                       token_budget // (TRANSCRIPT_PASSAGE_TOKENS + separator_tokens)))
+    if count == 1:
+        indices = [0]
+    else:
+        indices = sorted({round(i * (len(passages) - 1) / (count - 1)) for i in range(count)})
+    selected, used_tokens = [], 0
+    for index in indices:
+        passage, passage_tokens = passages[index]
+        if selected and used_tokens + passage_tokens + separator_tokens > token_budget:
+            break
+        selected.append(passage)
+        used_tokens += passage_tokens + separator_tokens
+    return TRANSCRIPT_PASSAGE_SEPARATOR.join(selected)
+
+
+def quiz_cache_key(transcript):
+    """
+    Returns the key of the generated quiz cache for the given transcript. It changes,
+    if the prompt version, the token budget of the transcript or the LLM backend
+    and its model change.
+    """
+    value = (f"{QUIZ_PROMPT_VERSION}\n{settings.QUIZ_TRANSCRIPT_TOKEN_BUDGET}\n"
+             f"{get_backend().cache_name}\n{transcript}")
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+def create_quiz(transcript, progress_callback=None):
     """
     It uses the transcript and the prompt to generate a quiz with the help of the 
-    GeminiAPI.
-    """
-    client = genai.Client()
-    response = client.models.generate_content(
-        model="gemini-3-flash-preview",
-        contents=f"""
-                Based on the following transcript, generate a quiz in valid JSON format.
-                The quiz must follow this exact structure:
-                {{"title": "Create a concise quiz title based on the topic of the transcript.",
-                "description": "Summarize the transcript in no more than 150 characters. 
-                Do not include any quiz questions or answers.",
-                "questions": [
-                {{"question_title": "The question goes here.",
-                "question_options": ["Option A", "Option B", "Option C", "Option D"],
-                "answer": "The correct answer from the above options"}},
-                ...
-                (exactly 10 questions)]}}
-                Requirements:
-                - Each question must have exactly 4 distinct answer options.
-                - Only one correct answer is allowed per question, 
-                and it must be present in 'question_options'.
-                - The output must be valid JSON and parsable as-is 
-                (e.g., using Python's json.loads).
-                - Do not include explanations, comments, or any text outside the JSON.
-                This is the following Transcript: {transcript}
-            """
-    )
-    cleaned_response = json.loads(response.text)
-    return cleaned_response
+    configured LLM backend (see quiz_app.llm). Long transcripts are condensed first
+    (see prepare_transcript).
+    The response is constrained to the quiz schema and parsed while it is streamed in
+    (see QuizStreamParser), so invalid questions or a truncated response do not waste
+    the whole quiz. Only the missing questions are requested again, up to
+    QUIZ_REPAIR_ATTEMPTS times. The whole quiz is only requested again, if the title
+    or description could not be parsed.
+    The progress_callback is called with the percentage of valid questions.
+    """
+    # Imported here, because the parser validates the questions with a serializer,
+    # which needs the models. The transcription processes import this module without
+    # django.setup() (see quiz_app.transcription).
+    from quiz_app.parsing import QuizStreamParser
+
+    transcript = prepare_transcript(transcript)
+    backend = get_backend()
+    parser = QuizStreamParser(progress_callback=progress_callback)
+    for _ in range(settings.QUIZ_REPAIR_ATTEMPTS + 1):
+        if parser.title is None or parser.description is None:
+            prompt, schema = build_prompt(transcript), QUIZ_SCHEMA
+        elif parser.missing_questions > 0:
+            titles = [question["question_title"] for question in parser.questions]
+            prompt = build_questions_prompt(transcript, parser.missing_questions, titles)
+            schema = QUESTIONS_SCHEMA
+        else:
+            break
+        parser.start()
+        backend.generate(prompt, schema=schema, on_chunk=parser.feed)
+    quiz = parser.result()
+    if quiz["title"] is None or quiz["description"] is None or parser.missing_questions > 0:
+        raise ValueError("The LLM did not generate a complete quiz.")
+    return quiz
@@ -0,0 +1,247 @@
+import time
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from quiz_app.models import GenerationJob, Transcript, GeneratedQuiz
+from quiz_app.api.serializers import CreateQuizSerializer
+from quiz_app.functions import (audio_workspace, download_audio, stream_audio, create_quiz,
+                                quiz_cache_key)
+from quiz_app.transcription import transcribe
+
+
+class QuizGenerationError(Exception):
+    """
+    Raised when one of the generation steps fails. The message is shown to the
+    user in the job status.
+    """
+
+
+class JobProgress:
+    """
+    Stores the current stage and progress of claimed jobs, so clients can follow
+    the generation (see GenerationJobEventsView). The progress is only written to the
+    database when the stage or the whole percentage changes.
+    """
+    def __init__(self, jobs=()):
+        self.job_ids = [job.pk for job in jobs]
+        self.stage = None
+        self.progress = None
+
+    def __call__(self, stage, progress=0.0):
+        progress = int(progress)
+        if not self.job_ids or (stage, progress) == (self.stage, self.progress):
+            return
+        self.stage, self.progress = stage, progress
+        (GenerationJob.objects
+         .filter(pk__in=self.job_ids)
+         .update(stage=stage, progress=progress, updated_at=timezone.now()))
+
+
+def get_transcript(video_id, progress=None):
+    """
+    Returns the transcript text of the given YouTube video. If the video was already
+    transcribed with the configured whisper model, the cached transcript is used.
+    Otherwise the audio is streamed into memory (or downloaded into a temporary
+    workspace, if AUDIO_STREAMING is disabled) and transcribed, and the result is cached.
+    """
+    progress = progress or JobProgress()
+    model_name = settings.WHISPER_MODEL
+    transcript = Transcript.objects.filter(video_id=video_id, model_name=model_name).first()
+    if transcript is not None:
+        return transcript.text
+    with audio_workspace() as workspace:
+        try:
+            progress(GenerationJob.Stage.DOWNLOADING)
+            load_audio = stream_audio if settings.AUDIO_STREAMING else download_audio
+            audio = load_audio(
+                video_id, workspace,
+                lambda percent: progress(GenerationJob.Stage.DOWNLOADING, percent))
+        except Exception as e:
+            raise QuizGenerationError("Failed to download audio. Check URL.") from e
+        try:
+            progress(GenerationJob.Stage.TRANSCRIBING)
+            transcription_result = transcribe(
+                audio, lambda percent: progress(GenerationJob.Stage.TRANSCRIBING, percent))
+            text = transcription_result["text"].strip()
+        except Exception as e:
+            raise QuizGenerationError("Failed to transcribe audio. Please try again.") from e
+    Transcript.objects.get_or_create(video_id=video_id, model_name=model_name,
+                                     defaults={"compressed_text": Transcript.compress(text)})
+    return text
+
+
+def get_cached_quiz(key):
+    """
+    Returns the cached quiz data for the given key, or None if there is no entry
+    or it has expired.
+    """
+    if settings.QUIZ_CACHE_TTL <= 0:
+        return None
+    now = timezone.now()
+    expired_before = now - timedelta(seconds=settings.QUIZ_CACHE_TTL)
+    entry = GeneratedQuiz.objects.filter(key=key, created_at__gte=expired_before).first()
+    if entry is None:
+        return None
+    GeneratedQuiz.objects.filter(pk=entry.pk).update(last_used_at=now)
+    return entry.data
+
+
+def store_cached_quiz(key, data):
+    """
+    Stores a generated quiz in the cache. Afterwards, expired entries and the least
+    recently used entries above QUIZ_CACHE_MAX_ENTRIES are removed.
+    """
+    if settings.QUIZ_CACHE_TTL <= 0:
+        return
+    now = timezone.now()
+    GeneratedQuiz.objects.update_or_create(key=key, defaults={"data": data, "created_at": now,
+                                                              "last_used_at": now})
+    expired_before = now - timedelta(seconds=settings.QUIZ_CACHE_TTL)
+    GeneratedQuiz.objects.filter(created_at__lt=expired_before).delete()
+    evicted = (GeneratedQuiz.objects
+               .order_by("-last_used_at", "-id")
+               .values_list("id", flat=True)[settings.QUIZ_CACHE_MAX_ENTRIES:])
+    GeneratedQuiz.objects.filter(id__in=list(evicted)).delete()
+
+
+def generate_quiz_data(video_id, force_regenerate=False, progress=None):
+    """
+    Runs the generation steps for the given YouTube video ID and returns the validated
+    quiz data, which can be saved for any number of users:
+        -1. Gets the transcript of the video (see get_transcript).
+        -2. Generates the quiz with the Gemini API. If the same transcript was already
+            used before, the cached quiz is reused, unless force_regenerate is set.
+        -3. Validates the generated quiz.
+    The progress of the steps is reported to the given JobProgress.
+    """
+    progress = progress or JobProgress()
+    transcript = get_transcript(video_id, progress)
+    progress(GenerationJob.Stage.GENERATING)
+    cache_key = quiz_cache_key(transcript)
+    generated_quiz = None if force_regenerate else get_cached_quiz(cache_key)
+    from_cache = generated_quiz is not None
+    if not from_cache:
+        try:
+            generated_quiz = create_quiz(
+                transcript, lambda percent: progress(GenerationJob.Stage.GENERATING, percent))
+        except Exception as e:
+            raise QuizGenerationError("Failed to generate quiz. Please try again.") from e
+    quiz_information_dict = {
+        "title": generated_quiz.get("title"),
+        "description": generated_quiz.get("description"),
+        "video_url": f"https://www.youtube.com/watch?v={video_id}",
+        "questions": generated_quiz.get("questions")
+    }
+    quiz_serializer = CreateQuizSerializer(data=quiz_information_dict)
+    if not quiz_serializer.is_valid():
+        raise QuizGenerationError("The generated quiz was invalid. Please try again.")
+    if not from_cache:
+        store_cached_quiz(cache_key, generated_quiz)
+    return quiz_information_dict
+
+
+def save_quiz(quiz_data, user):
+    """
+    Saves a new quiz with the given quiz data for the user.
+    """
+    quiz_serializer = CreateQuizSerializer(data=quiz_data)
+    quiz_serializer.is_valid(raise_exception=True)
+    return quiz_serializer.save(user=user)
+
+
+def generate_quiz(video_id, user, force_regenerate=False):
+    """
+    Generates a quiz for the given YouTube video ID and saves it for the user.
+    """
+    return save_quiz(generate_quiz_data(video_id, force_regenerate), user)
+
+
+def claim_next_jobs():
+    """
+    Claims the oldest pending job and marks it as running. All other pending jobs for
+    the same video are claimed together with it, so the video is only downloaded,
+    transcribed and sent to Gemini once and every job gets a copy of the result.
+    Jobs with force_regenerate are always claimed on their own.
+    Jobs for a video, which is currently generated by another worker, are skipped until
+    it is finished, so they can use the cached transcript and quiz afterwards.
+    Running jobs which exceed GENERATION_JOB_TIMEOUT are treated as abandoned and can
+    be claimed again.
+    The status is switched with a conditional update, so a job can only be claimed
+    by one worker, even if several worker processes poll the queue at the same time.
+    Returns the claimed jobs, the first one being the oldest, or an empty list if there
+    is nothing to do.
+    """
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=settings.GENERATION_JOB_TIMEOUT)
+    running_video_ids = (GenerationJob.objects
+                         .filter(status=GenerationJob.Status.RUNNING, started_at__gte=stale_before)
+                         .values("video_id"))
+    claimable = ((Q(status=GenerationJob.Status.PENDING) & ~Q(video_id__in=running_video_ids))
+                 | Q(status=GenerationJob.Status.RUNNING, started_at__lt=stale_before))
+    candidates = (GenerationJob.objects
+                  .filter(claimable)
+                  .order_by("created_at", "id")
+                  .values_list("id", "video_id", "force_regenerate")[:10])
+    for job_id, video_id, force_regenerate in list(candidates):
+        if force_regenerate:
+            same_generation = Q(pk=job_id)
+        else:
+            same_generation = Q(video_id=video_id, force_regenerate=False)
+        claim_token = uuid.uuid4().hex
+        claimed = (GenerationJob.objects
+                   .filter(claimable, same_generation)
+                   .update(status=GenerationJob.Status.RUNNING, started_at=now, updated_at=now,
+                           claim_token=claim_token))
+        if claimed:
+            return list(GenerationJob.objects
+                        .filter(claim_token=claim_token)
+                        .select_related("user")
+                        .order_by("created_at", "id"))
+    return []
+
+
+def run_jobs(jobs):
+    """
+    Generates the quiz once for a list of claimed jobs of the same video and saves a
+    copy of it for every job. The result or the error message is stored on the jobs.
+    """
+    error = ""
+    try:
+        quiz_data = generate_quiz_data(jobs[0].video_id, jobs[0].force_regenerate,
+                                       JobProgress(jobs))
+    except QuizGenerationError as e:
+        error = str(e)
+    except Exception:
+        error = "Failed to generate quiz. Please try again."
+    for job in jobs:
+        job.status = GenerationJob.Status.FAILED
+        job.error = error
+        if not error:
+            try:
+                job.quiz = save_quiz(quiz_data, job.user)
+                job.status = GenerationJob.Status.DONE
+                job.stage = GenerationJob.Stage.SAVED
+                job.progress = 100
+            except Exception:
+                job.error = "Failed to save quiz. Please try again."
+        job.finished_at = timezone.now()
+        job.save(update_fields=["quiz", "status", "stage", "progress", "error", "finished_at",
+                                "updated_at"])
+    return jobs
+
+
+def run_worker(poll_interval=2.0, once=False):
+    """
+    Processes queued jobs until stopped. If once is set, the worker returns
+    as soon as the queue is empty.
+    """
+    while True:
+        jobs = claim_next_jobs()
+        if jobs:
+            run_jobs(jobs)
+            continue
+        if once:
+            return
+        time.sleep(poll_interval)
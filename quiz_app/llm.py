@@ -0,0 +1,318 @@
+import hashlib
+import json
+import threading
+import time
+import httpx
+import tenacity
+from django.conf import settings
+from django.utils.module_loading import import_string
+from google import genai
+
+
+# Increase this every time the prompt changes, so quizzes that were
+# cached with an older prompt are not used anymore.
+QUIZ_PROMPT_VERSION = 2
+
+# HTTP status codes, which are worth a retry (timeouts, rate limits and
+# temporary errors of the upstream service).
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+QUESTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "question_title": {"type": "string"},
+        "question_options": {"type": "array", "items": {"type": "string"}},
+        "answer": {"type": "string"},
+    },
+    "required": ["question_title", "question_options", "answer"],
+    "additionalProperties": False,
+}
+
+# JSON schemas of the responses. Backends, which support structured output, only
+# generate responses matching them.
+QUESTIONS_SCHEMA = {
+    "type": "object",
+    "properties": {"questions": {"type": "array", "items": QUESTION_SCHEMA}},
+    "required": ["questions"],
+    "additionalProperties": False,
+}
+QUIZ_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string"},
+        "description": {"type": "string"},
+        "questions": {"type": "array", "items": QUESTION_SCHEMA},
+    },
+    "required": ["title", "description", "questions"],
+    "additionalProperties": False,
+}
+
+_backend = None
+_semaphore = None
+_semaphore_lock = threading.Lock()
+
+
+def build_prompt(transcript):
+    """
+    Returns the prompt, which asks the LLM to generate a quiz for the transcript.
+    """
+    return f"""
+                Based on the following transcript, generate a quiz in valid JSON format.
+                The quiz must follow this exact structure:
+                {{"title": "Create a concise quiz title based on the topic of the transcript.",
+                "description": "Summarize the transcript in no more than 150 characters. 
+                Do not include any quiz questions or answers.",
+                "questions": [
+                {{"question_title": "The question goes here.",
+                "question_options": ["Option A", "Option B", "Option C", "Option D"],
+                "answer": "The correct answer from the above options"}},
+                ...
+                (exactly 10 questions)]}}
+                Requirements:
+                - Each question must have exactly 4 distinct answer options.
+                - Only one correct answer is allowed per question, 
+                and it must be present in 'question_options'.
+                - The output must be valid JSON and parsable as-is 
+                (e.g., using Python's json.loads).
+                - Do not include explanations, comments, or any text outside the JSON.
+                This is the following Transcript: {transcript}
+            """
+
+
+def build_questions_prompt(transcript, count, existing_titles):
+    """
+    Returns the prompt, which asks the LLM for count additional questions, if some
+    questions of the quiz were missing or invalid.
+    """
+    existing = "\n".join(f"- {title}" for title in existing_titles)
+    return f"""
+                Based on the following transcript, generate exactly {count} quiz questions
+                in valid JSON format. The output must follow this exact structure:
+                {{"questions": [
+                {{"question_title": "The question goes here.",
+                "question_options": ["Option A", "Option B", "Option C", "Option D"],
+                "answer": "The correct answer from the above options"}},
+                ...]}}
+                Requirements:
+                - Each question must have exactly 4 distinct answer options.
+                - Only one correct answer is allowed per question, 
+                and it must be present in 'question_options'.
+                - Do not repeat any of these questions:
+                {existing}
+                - Do not include explanations, comments, or any text outside the JSON.
+                This is the following Transcript: {transcript}
+            """
+
+
+class QuizBackend:
+    """
+    Base class of the LLM backends, which generate the quizzes. The backend is
+    selected with the QUIZ_LLM_BACKEND setting.
+    """
+    model_name = ""
+
+    @property
+    def cache_name(self):
+        """
+        Identifies the backend and model in the generated quiz cache.
+        """
+        return f"{type(self).__name__}:{self.model_name}"
+
+    def generate(self, prompt, schema=None, on_chunk=None):
+        """
+        Sends the prompt to the LLM and returns the text of the response. If a JSON
+        schema is given, the response is constrained to it, as far as the backend
+        supports structured output. on_chunk is called with every part of the response
+        as soon as it is received.
+        Failed requests are retried up to LLM_MAX_RETRIES times with a jittered
+        exponential backoff, if the error is temporary (see is_retryable). Every
+        attempt waits for a free slot of the LLM semaphore (see get_llm_semaphore).
+        """
+        retrying = tenacity.Retrying(
+            stop=tenacity.stop_after_attempt(settings.LLM_MAX_RETRIES + 1),
+            wait=tenacity.wait_random_exponential(multiplier=1, max=settings.LLM_RETRY_MAX_WAIT),
+            retry=tenacity.retry_if_exception(self.is_retryable),
+            reraise=True,
+        )
+        return retrying(self._limited_request, prompt, schema, on_chunk)
+
+    def _limited_request(self, prompt, schema, on_chunk):
+        with get_llm_semaphore():
+            return self.request(prompt, schema, on_chunk)
+
+    def request(self, prompt, schema=None, on_chunk=None):
+        """
+        Sends a single request to the LLM and returns the text of the response.
+        If the connection breaks off after a part of the response was received, that
+        part is returned instead of retrying the whole request. The caller keeps the
+        complete parts of it and only requests what is missing.
+        """
+        chunks = []
+        try:
+            for chunk in self.stream(prompt, schema):
+                chunks.append(chunk)
+                if on_chunk is not None:
+                    on_chunk(chunk)
+        except Exception as e:
+            if not chunks or not self.is_retryable(e):
+                raise
+        return "".join(chunks)
+
+    def stream(self, prompt, schema=None):
+        """
+        Sends the prompt to the LLM and yields the text of the response in parts.
+        """
+        raise NotImplementedError
+
+    def is_retryable(self, exception):
+        """
+        Returns True, if the request failed because of a temporary problem.
+        """
+        return isinstance(exception, httpx.TransportError)
+
+
+class GeminiBackend(QuizBackend):
+    """
+    Generates quizzes with the Gemini API. The API key is read from the
+    GEMINI_API_KEY environment variable.
+    """
+    def __init__(self):
+        self.model_name = settings.GEMINI_MODEL
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        """
+        The Gemini client is created on first use and shared by all threads of the
+        process, so its HTTP connections are reused.
+        """
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = genai.Client(http_options=genai.types.HttpOptions(
+                        timeout=int(settings.LLM_TIMEOUT * 1000)))
+        return self._client
+
+    def stream(self, prompt, schema=None):
+        config = None
+        if schema is not None:
+            config = genai.types.GenerateContentConfig(response_mime_type="application/json",
+                                                       response_json_schema=schema)
+        for chunk in self.client.models.generate_content_stream(model=self.model_name,
+                                                                contents=prompt, config=config):
+            if chunk.text:
+                yield chunk.text
+
+    def is_retryable(self, exception):
+        if isinstance(exception, genai.errors.APIError):
+            return exception.code in RETRYABLE_STATUS_CODES
+        return super().is_retryable(exception)
+
+
+class OpenAICompatibleBackend(QuizBackend):
+    """
+    Generates quizzes with any API, which implements the chat completions endpoint of
+    OpenAI (e.g. OpenAI, vLLM, Ollama or LM Studio).
+    """
+    def __init__(self):
+        self.model_name = settings.OPENAI_COMPATIBLE_MODEL
+        self.base_url = settings.OPENAI_COMPATIBLE_BASE_URL.rstrip("/")
+        self.api_key = settings.OPENAI_COMPATIBLE_API_KEY
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        # One client per process, its connection pool is shared by all threads.
+        self.client = httpx.Client(
+            headers=headers,
+            timeout=settings.LLM_TIMEOUT,
+            limits=httpx.Limits(max_connections=settings.LLM_MAX_CONCURRENCY),
+        )
+
+    def stream(self, prompt, schema=None):
+        if schema is not None:
+            response_format = {"type": "json_schema",
+                               "json_schema": {"name": "quiz", "schema": schema, "strict": True}}
+        else:
+            response_format = {"type": "json_object"}
+        with self.client.stream(
+            "POST",
+            f"{self.base_url}/chat/completions",
+            json={
+                "model": self.model_name,
+                "messages": [{"role": "user", "content": prompt}],
+                "response_format": response_format,
+                "stream": True,
+            },
+        ) as response:
+            response.raise_for_status()
+            # The response is sent as server-sent events, one JSON object per event.
+            for line in response.iter_lines():
+                data = line[len("data:"):].strip()
+                if not line.startswith("data:") or data == "[DONE]":
+                    continue
+                choices = json.loads(data).get("choices") or [{}]
+                content = choices[0].get("delta", {}).get("content")
+                if content:
+                    yield content
+
+    def is_retryable(self, exception):
+        if isinstance(exception, httpx.HTTPStatusError):
+            return exception.response.status_code in RETRYABLE_STATUS_CODES
+        return super().is_retryable(exception)
+
+
+class StubBackend(QuizBackend):
+    """
+    Local backend for load tests and benchmarks. It does not call any external
+    service and returns a valid quiz after QUIZ_STUB_LATENCY seconds. The quiz only
+    depends on the prompt, so the same transcript always results in the same quiz.
+    """
+    model_name = "stub"
+    chunk_size = 256
+
+    def stream(self, prompt, schema=None):
+        text = self.build_quiz(prompt)
+        for start in range(0, len(text), self.chunk_size):
+            yield text[start:start + self.chunk_size]
+
+    def build_quiz(self, prompt):
+        time.sleep(settings.QUIZ_STUB_LATENCY)
+        seed = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        questions = []
+        for number in range(1, 11):
+            options = [f"Option {letter} {seed}-{number}" for letter in "ABCD"]
+            questions.append({
+                "question_title": f"Stub question {number} ({seed})",
+                "question_options": options,
+                "answer": options[int(seed, 16) % 4],
+            })
+        return json.dumps({
+            "title": f"Stub quiz {seed}",
+            "description": "Generated by the local stub backend.",
+            "questions": questions,
+        })
+
+
+def get_llm_semaphore():
+    """
+    Returns the semaphore, which limits the number of concurrent LLM requests of this
+    process to LLM_MAX_CONCURRENCY. Requests beyond that wait for a free slot, instead
+    of overloading the upstream service and running into its rate limits.
+    """
+    global _semaphore
+    with _semaphore_lock:
+        limit = settings.LLM_MAX_CONCURRENCY
+        if _semaphore is None or _semaphore[0] != limit:
+            _semaphore = (limit, threading.BoundedSemaphore(limit))
+        return _semaphore[1]
+
+
+def get_backend():
+    """
+    Returns the LLM backend configured in QUIZ_LLM_BACKEND. It is created once
+    per process and shared by all threads, together with its HTTP client.
+    """
+    global _backend
+    path = settings.QUIZ_LLM_BACKEND
+    if _backend is None or _backend[0] != path:
+        _backend = (path, import_string(path)())
+    return _backend[1]
@@ -0,0 +1,123 @@
+import statistics
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from django.urls import reverse
+from rest_framework.test import APIRequestFactory, force_authenticate
+from quiz_app.api.views import QuizListView
+from quiz_app.caching import bump_list_version
+from quiz_app.models import Quiz, Question
+
+
+class Command(BaseCommand):
+    help = ("Seeds a user with many quizzes and reports the latency of the quiz list. "
+            "Run it before and after a change to compare. Only use it on a development database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--quizzes", type=int, default=100000,
+                            help="Number of quizzes of the benchmark user.")
+        parser.add_argument("--questions", type=int, default=10, help="Questions per quiz.")
+        parser.add_argument("--requests", type=int, default=20,
+                            help="Number of requests per measured list.")
+        parser.add_argument("--page-size", type=int, default=20)
+        parser.add_argument("--username", default="quiz-benchmark",
+                            help="Username of the benchmark user. The user is created if needed.")
+        parser.add_argument("--host", default="localhost",
+                            help="Host of the requests, has to be allowed in ALLOWED_HOSTS.")
+        parser.add_argument("--keep", action="store_true",
+                            help="Keep the seeded quizzes and the created benchmark user afterwards.")
+
+    def handle(self, *args, **options):
+        user, created = User.objects.get_or_create(username=options["username"])
+        seeded = []
+        try:
+            self.seed(user, options["quizzes"], options["questions"], seeded)
+            self.run_benchmarks(user, options)
+        finally:
+            # An existing user is never deleted, only the quizzes seeded for it.
+            if not options["keep"]:
+                if created:
+                    user.delete()
+                else:
+                    self.delete_quizzes(seeded)
+
+    def seed(self, user, quiz_count, question_count, seeded, batch_size=2000):
+        """
+        Creates quizzes for the user, until the user has quiz_count quizzes.
+        The ids of the created quizzes are added to seeded.
+        """
+        existing = Quiz.objects.filter(user=user).count()
+        if existing >= quiz_count:
+            return
+        self.stdout.write(f"Seeding {quiz_count - existing} quizzes...")
+        for start in range(existing, quiz_count, batch_size):
+            with transaction.atomic():
+                quizzes = Quiz.objects.bulk_create(
+                    Quiz(user=user, title=f"Benchmark quiz {number}",
+                         description="Generated by benchmark_quiz_list.",
+                         video_url="https://www.youtube.com/watch?v=aXOChLn5ZdQ")
+                    for number in range(start, min(start + batch_size, quiz_count)))
+                Question.objects.bulk_create(
+                    Question(quiz=quiz, question_title=f"Question {number}",
+                             question_options=["A", "B", "C", "D"], answer="A")
+                    for quiz in quizzes for number in range(question_count))
+            seeded.extend(quiz.pk for quiz in quizzes)
+        bump_list_version(user.pk)
+
+    def delete_quizzes(self, quiz_ids, batch_size=2000):
+        for start in range(0, len(quiz_ids), batch_size):
+            Quiz.objects.filter(pk__in=quiz_ids[start:start + batch_size]).delete()
+
+    def run_benchmarks(self, user, options):
+        """
+        Measures the database queries with the response cache disabled and afterwards
+        the first page served from the response cache.
+        """
+        url = reverse("quiz-list")
+        page_size = options["page_size"]
+        benchmarks = [
+            ("first page", {"page_size": page_size}),
+            ("first page, summary", {"page_size": page_size, "fields": "summary"}),
+            ("tenth page", self.cursor_params(user, url, options, pages=10)),
+        ]
+        self.stdout.write(f"Quiz list of {Quiz.objects.filter(user=user).count()} quizzes "
+                          f"on {connection.vendor}, {options['requests']} requests each:")
+        for name, params in benchmarks:
+            with override_settings(QUIZ_RESPONSE_CACHE_TTL=0):
+                self.measure(user, url, name, params, options)
+        self.measure(user, url, "first page, cached", {"page_size": page_size}, options)
+        queryset = Quiz.objects.filter(user=user).order_by("-created_at", "-id")[:page_size]
+        self.stdout.write("Query plan of the first page:")
+        self.stdout.write(queryset.explain())
+
+    def measure(self, user, url, name, params, options):
+        durations = [self.request(user, url, params, options["host"])[1]
+                     for _ in range(options["requests"])]
+        self.stdout.write(f"  {name:<22} median {statistics.median(durations):8.2f} ms"
+                          f"   max {max(durations):8.2f} ms")
+
+    def cursor_params(self, user, url, options, pages):
+        """
+        Follows the next links and returns the parameters of the given page.
+        """
+        params = {"page_size": options["page_size"]}
+        for _ in range(pages - 1):
+            response, _ = self.request(user, url, params, options["host"])
+            next_url = response.data["next"]
+            if next_url is None:
+                break
+            params = {**params, "cursor": next_url.split("cursor=")[1].split("&")[0]}
+        return params
+
+    def request(self, user, url, params, host):
+        """
+        Calls the quiz list view and returns the response and its duration in ms.
+        """
+        request = APIRequestFactory().get(url, params, HTTP_HOST=host)
+        force_authenticate(request, user=user)
+        start = time.perf_counter()
+        response = QuizListView.as_view()(request)
+        response.render()
+        return response, (time.perf_counter() - start) * 1000
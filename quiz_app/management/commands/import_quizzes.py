@@ -0,0 +1,41 @@
+import json
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from quiz_app.api.serializers import CreateQuizSerializer, CreateQuizListSerializer
+
+
+class Command(BaseCommand):
+    help = ("Imports quizzes from a JSON file for a user. The file contains a list of quizzes "
+            "with title, description, video_url and questions.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Path of the JSON file.")
+        parser.add_argument("--user", required=True, help="Username of the owner of the quizzes.")
+        parser.add_argument("--batch-size", type=int, default=500,
+                            help="Number of quizzes, which are inserted with one statement.")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist.")
+        with open(options["path"], encoding="utf-8") as file:
+            quizzes = json.load(file)
+        if not isinstance(quizzes, list):
+            raise CommandError("The file has to contain a list of quizzes.")
+
+        serializer = CreateQuizSerializer(data=quizzes, many=True)
+        if not serializer.is_valid():
+            errors = [f"Quiz {index}: {error}" for index, error in enumerate(serializer.errors) if error]
+            raise CommandError("Invalid quizzes, nothing was imported.\n" + "\n".join(errors))
+
+        # Either all quizzes are imported or none of them.
+        batch_size = options["batch_size"]
+        validated_quizzes = serializer.validated_data
+        with transaction.atomic():
+            for start in range(0, len(validated_quizzes), batch_size):
+                batch = [{**quiz_data, "user": user}
+                         for quiz_data in validated_quizzes[start:start + batch_size]]
+                CreateQuizListSerializer.create_quizzes(batch)
+        self.stdout.write(f"Imported {len(validated_quizzes)} quizzes for {user.username}.")
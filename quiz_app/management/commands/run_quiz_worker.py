@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from quiz_app.jobs import run_worker
+
+
+class Command(BaseCommand):
+    help = "Processes queued quiz generation jobs. Start several workers to generate quizzes in parallel."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--poll-interval", type=float, default=2.0,
+                            help="Seconds to wait before polling an empty queue again.")
+        parser.add_argument("--once", action="store_true",
+                            help="Stop as soon as the queue is empty.")
+
+    def handle(self, *args, **options):
+        self.stdout.write("Quiz worker started.")
+        try:
+            run_worker(poll_interval=options["poll_interval"], once=options["once"])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write("Quiz worker stopped.")
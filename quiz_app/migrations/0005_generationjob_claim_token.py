@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 19:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz_app', '0004_generatedquiz'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generationjob',
+            name='claim_token',
+            field=models.CharField(blank=True, db_index=True, max_length=32),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-18 19:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz_app', '0005_generationjob_claim_token'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generationjob',
+            name='progress',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='generationjob',
+            name='stage',
+            field=models.CharField(choices=[('queued', 'Queued'), ('downloading', 'Downloading'), ('transcribing', 'Transcribing'), ('generating', 'Generating'), ('saved', 'Saved')], default='queued', max_length=20),
+        ),
+    ]
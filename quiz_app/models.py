@@ -1,5 +1,7 @@
+import zlib
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 # Create your models here.
 
@@ -12,6 +14,12 @@ class Quiz(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     video_url = models.URLField()
 
+    class Meta:
+        indexes = [
+            # Quiz list of a user, newest first (see QuizListView).
+            models.Index(fields=["user", "-created_at", "-id"], name="quiz_user_created_idx"),
+        ]
+
 
 class Question(models.Model):
     quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name="questions")
@@ -20,3 +28,84 @@ class Question(models.Model):
     answer = models.CharField(max_length=200)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Questions of the listed quizzes in their original order.
+            models.Index(fields=["quiz", "id"], name="question_quiz_id_idx"),
+        ]
+
+
+class GenerationJob(models.Model):
+    """
+    A queued quiz generation. Jobs are created by the createQuiz endpoint and
+    processed by the run_quiz_worker management command. Jobs which are claimed
+    together by a worker share the same claim_token.
+    """
+    class Status(models.TextChoices):
+        PENDING = "pending"
+        RUNNING = "running"
+        DONE = "done"
+        FAILED = "failed"
+
+    class Stage(models.TextChoices):
+        QUEUED = "queued"
+        DOWNLOADING = "downloading"
+        TRANSCRIBING = "transcribing"
+        GENERATING = "generating"
+        SAVED = "saved"
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="generation_jobs")
+    video_id = models.CharField(max_length=11)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING,
+                              db_index=True)
+    stage = models.CharField(max_length=20, choices=Stage.choices, default=Stage.QUEUED)
+    progress = models.PositiveSmallIntegerField(default=0)
+    force_regenerate = models.BooleanField(default=False)
+    claim_token = models.CharField(max_length=32, blank=True, db_index=True)
+    error = models.TextField(blank=True)
+    quiz = models.ForeignKey(Quiz, on_delete=models.SET_NULL, null=True, blank=True,
+                             related_name="+")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+
+class Transcript(models.Model):
+    """
+    Cached transcript of a YouTube video, so the audio of a video only has to be
+    downloaded and transcribed once per whisper model. The text is stored compressed.
+    """
+    video_id = models.CharField(max_length=11)
+    model_name = models.CharField(max_length=50)
+    compressed_text = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["video_id", "model_name"],
+                                    name="unique_transcript_per_model")
+        ]
+
+    @staticmethod
+    def compress(text):
+        return zlib.compress(text.encode("utf-8"), level=9)
+
+    @property
+    def text(self):
+        return zlib.decompress(self.compressed_text).decode("utf-8")
+
+
+class GeneratedQuiz(models.Model):
+    """
+    Cached output of the quiz generation. The key is a hash of the transcript, the
+    prompt version and the model name, so the same transcript does not have to be
+    sent to Gemini again. Entries expire after QUIZ_CACHE_TTL seconds and the least
+    recently used entries are removed, as soon as there are more than
+    QUIZ_CACHE_MAX_ENTRIES.
+    """
+    key = models.CharField(max_length=64, unique=True)
+    data = models.JSONField()
+    created_at = models.DateTimeField(default=timezone.now)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
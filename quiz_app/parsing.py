@@ -0,0 +1,176 @@
+import json
+from quiz_app.api.serializers import CreateQuestionSerializer
+
+
+QUIZ_QUESTION_COUNT = 10
+QUIZ_DESCRIPTION_MAX_LENGTH = 150
+
+
+def remove_trailing_commas(text):
+    """
+    Removes commas directly in front of a closing bracket or brace, which JSON does
+    not allow but LLMs like to write. Commas inside of strings are kept.
+    """
+    result = []
+    in_string = escape = False
+    for index, char in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "," and text[index + 1:].lstrip()[:1] in ("]", "}"):
+            continue
+        result.append(char)
+    return "".join(result)
+
+
+def loads_lenient(text):
+    """
+    Parses a JSON value. If it is invalid, it is parsed again without trailing commas.
+    """
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return json.loads(remove_trailing_commas(text))
+
+
+def is_valid_question(question):
+    """
+    Returns True, if the question can be saved (see CreateQuestionSerializer).
+    """
+    return isinstance(question, dict) and CreateQuestionSerializer(data=question).is_valid()
+
+
+class QuizStreamParser:
+    """
+    Parses the quiz while the response of the LLM is streamed in. Every chunk of the
+    response is passed to feed. As soon as a question object is complete, it is
+    validated and kept, if it is valid. So a response, which is wrapped in markdown
+    fences, contains trailing commas or breaks off in the middle, still results in all
+    of its complete and valid questions, and only the missing ones have to be requested
+    again (see quiz_app.functions.create_quiz).
+    Text in front of the first "{" and after the end of the JSON object is ignored.
+    The parser can be reused for several responses (see start), the title and
+    description of the first response and the questions of all responses are kept.
+    The progress_callback is called with the percentage of valid questions.
+    """
+    def __init__(self, question_count=QUIZ_QUESTION_COUNT, progress_callback=None):
+        self.question_count = question_count
+        self.progress_callback = progress_callback
+        self.title = None
+        self.description = None
+        self.questions = []
+        self.invalid_questions = 0
+        self.start()
+
+    def start(self):
+        """
+        Prepares the parser for the next response.
+        """
+        self.buffer = ""
+        self.position = 0
+        self.stack = []
+        self.in_string = False
+        self.escape = False
+        self.string_start = None
+        self.last_string = None
+        self.key = None
+        self.expects_value = False
+        self.questions_depth = None
+        self.question_start = None
+        self.done = False
+
+    @property
+    def missing_questions(self):
+        return self.question_count - len(self.questions)
+
+    def feed(self, chunk):
+        """
+        Parses the next chunk of the response.
+        """
+        self.buffer += chunk
+        while self.position < len(self.buffer) and not self.done:
+            self._parse_char(self.position, self.buffer[self.position])
+            self.position += 1
+
+    def _parse_char(self, index, char):
+        if self.in_string:
+            if self.escape:
+                self.escape = False
+            elif char == "\\":
+                self.escape = True
+            elif char == '"':
+                self.in_string = False
+                self._end_string(self.buffer[self.string_start:index + 1])
+            return
+        if not self.stack and char != "{":
+            return
+        if char == '"':
+            self.in_string = True
+            self.string_start = index
+        elif char in "{[":
+            if len(self.stack) == 1 and char == "[" and self.key == "questions":
+                self.questions_depth = 2
+            elif len(self.stack) == self.questions_depth and char == "{":
+                self.question_start = index
+            self.stack.append(char)
+        elif char in "}]":
+            if self.stack:
+                self.stack.pop()
+            if len(self.stack) == self.questions_depth and self.question_start is not None:
+                self._add_question(self.buffer[self.question_start:index + 1])
+                self.question_start = None
+            elif len(self.stack) == 1 and self.questions_depth is not None:
+                self.questions_depth = None
+            elif not self.stack:
+                self.done = True
+        elif len(self.stack) == 1:
+            if char == ":":
+                self.key = self.last_string
+                self.expects_value = True
+            elif char == ",":
+                self.expects_value = False
+
+    def _end_string(self, literal):
+        if len(self.stack) != 1:
+            return
+        try:
+            value = json.loads(literal)
+        except json.JSONDecodeError:
+            return
+        if not self.expects_value:
+            self.last_string = value
+        elif self.key == "title" and self.title is None:
+            self.title = value
+        elif self.key == "description" and self.description is None:
+            self.description = value
+
+    def _add_question(self, text):
+        if self.missing_questions <= 0:
+            return
+        try:
+            question = loads_lenient(text)
+        except json.JSONDecodeError:
+            question = None
+        titles = {existing["question_title"] for existing in self.questions}
+        if not is_valid_question(question) or question["question_title"] in titles:
+            self.invalid_questions += 1
+            return
+        self.questions.append({key: question[key]
+                               for key in ("question_title", "question_options", "answer")})
+        if self.progress_callback is not None:
+            self.progress_callback(100.0 * len(self.questions) / self.question_count)
+
+    def result(self):
+        """
+        Returns the parsed quiz. A description, which is too long, is shortened.
+        """
+        description = self.description
+        if description is not None and len(description) > QUIZ_DESCRIPTION_MAX_LENGTH:
+            description = description[:QUIZ_DESCRIPTION_MAX_LENGTH - 3].rstrip() + "..."
+        return {"title": self.title, "description": description, "questions": self.questions}
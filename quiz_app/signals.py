@@ -0,0 +1,54 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from quiz_app.caching import bump_list_version, invalidate_quiz
+from quiz_app.models import Quiz, Question
+
+
+@receiver(post_save, sender=Quiz)
+@receiver(post_delete, sender=Quiz)
+def invalidate_quiz_cache(sender, instance, **kwargs):
+    """
+    Removes the cached responses of a created, changed or deleted quiz.
+    Quizzes created with bulk_create don't send signals, they are invalidated by
+    CreateQuizListSerializer instead.
+    The cache is only invalidated after the commit. Otherwise a concurrent request
+    could cache the data from before the commit under the new version.
+    """
+    quiz_id, user_id = instance.pk, instance.user_id
+    transaction.on_commit(lambda: invalidate_quiz(quiz_id, user_id))
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def invalidate_question_cache(sender, instance, origin=None, **kwargs):
+    """
+    Questions are part of the cached quiz responses, e.g. if they are changed in the admin.
+    Their quiz is marked as updated, because the ETag and Last-Modified of the quiz
+    detail are derived from updated_at. Questions deleted together with their quiz
+    are handled by invalidate_quiz_cache.
+    """
+    if isinstance(origin, Quiz):
+        return
+    Quiz.objects.filter(pk=instance.quiz_id).update(updated_at=timezone.now())
+    if Question.quiz.is_cached(instance):
+        user_id = instance.quiz.user_id
+    else:
+        user_id = (Quiz.objects.filter(pk=instance.quiz_id)
+                   .values_list("user_id", flat=True).first())
+    if user_id is not None:
+        quiz_id = instance.quiz_id
+        transaction.on_commit(lambda: invalidate_quiz(quiz_id, user_id))
+
+
+@receiver(post_save, sender=User)
+def reset_quiz_list_version(sender, instance, created, **kwargs):
+    """
+    A new user gets a new list version, so no cached list of a deleted user with the
+    same id can be used.
+    """
+    if created:
+        user_id = instance.pk
+        transaction.on_commit(lambda: bump_list_version(user_id))
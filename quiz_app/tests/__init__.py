@@ -0,0 +1,12 @@
+from django.conf import settings
+
+
+# CACHES for tests, which use the quiz response cache. It is kept in memory, so the
+# tests don't read or clear the files of a development server.
+MEMORY_RESPONSE_CACHES = {
+    **settings.CACHES,
+    "quiz_responses": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "quiz_responses",
+    },
+}
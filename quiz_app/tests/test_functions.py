@@ -0,0 +1,171 @@
+import importlib
+import io
+import os
+import re
+import threading
+from unittest import mock
+
+import numpy as np
+import whisper
+from django.test import SimpleTestCase, override_settings
+
+from quiz_app import functions
+
+
+class WhisperModelTests(SimpleTestCase):
+    def setUp(self):
+        functions._whisper_models.clear()
+
+    def tearDown(self):
+        functions._whisper_models.clear()
+
+    @override_settings(WHISPER_MODEL="tiny")
+    def test_model_is_loaded_only_once(self):
+        with mock.patch("quiz_app.functions.whisper.load_model") as load_model:
+            first_model, _ = functions.get_whisper_model()
+            second_model, _ = functions.get_whisper_model()
+        load_model.assert_called_once_with("tiny")
+        self.assertIs(first_model, second_model)
+
+    def test_model_is_loaded_only_once_across_threads(self):
+        with mock.patch("quiz_app.functions.whisper.load_model") as load_model:
+            threads = [threading.Thread(target=functions.get_whisper_model, args=("base",))
+                       for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        load_model.assert_called_once_with("base")
+
+    def test_different_models_are_cached_separately(self):
+        with mock.patch("quiz_app.functions.whisper.load_model") as load_model:
+            functions.get_whisper_model("tiny")
+            functions.get_whisper_model("base")
+        self.assertEqual(load_model.call_count, 2)
+
+
+class TranscriptionProgressTests(SimpleTestCase):
+    def test_progress_bar_is_only_replaced_during_transcription(self):
+        whisper_transcribe = importlib.import_module("whisper.transcribe")
+        used_bars = []
+        model = mock.Mock()
+        model.transcribe.side_effect = lambda audio, fp16: used_bars.append(
+            whisper_transcribe.tqdm.tqdm) or {"text": "transcript"}
+        with mock.patch("quiz_app.functions.get_whisper_model",
+                        return_value=(model, threading.Lock())):
+            functions.transcribe_audio("audio.aac")
+        self.assertEqual(used_bars, [functions._TranscriptionProgressBar])
+        self.assertIsNot(whisper_transcribe.tqdm.tqdm, functions._TranscriptionProgressBar)
+
+    def test_progress_bar_is_restored_after_overlapping_transcriptions(self):
+        whisper_transcribe = importlib.import_module("whisper.transcribe")
+        original = whisper_transcribe.tqdm
+        first = functions.progress_bar_installed()
+        second = functions.progress_bar_installed()
+        first.__enter__()
+        second.__enter__()
+        first.__exit__(None, None, None)
+        self.assertIs(whisper_transcribe.tqdm.tqdm, functions._TranscriptionProgressBar)
+        second.__exit__(None, None, None)
+        self.assertIs(whisper_transcribe.tqdm, original)
+
+    def test_progress_is_reported_to_callback_of_current_thread(self):
+        reported = []
+        model = mock.Mock()
+
+        def transcribe(audio_path, fp16):
+            with functions._TranscriptionProgressBar(total=200, disable=True) as bar:
+                bar.update(50)
+                bar.update(150)
+            return {"text": "transcript"}
+
+        model.transcribe.side_effect = transcribe
+        with mock.patch("quiz_app.functions.get_whisper_model",
+                        return_value=(model, threading.Lock())):
+            functions.transcribe_audio("audio.aac", reported.append)
+        self.assertEqual(reported, [25.0, 100.0])
+        self.assertIsNone(functions._transcription_progress.callback)
+
+
+class AudioWorkspaceTests(SimpleTestCase):
+    def test_workspace_is_removed_afterwards(self):
+        with functions.audio_workspace() as workspace:
+            with open(os.path.join(workspace, "audio.aac"), "wb") as file:
+                file.write(b"audio")
+        self.assertFalse(os.path.exists(workspace))
+
+    def test_workspace_is_removed_on_error(self):
+        with self.assertRaises(RuntimeError):
+            with functions.audio_workspace() as workspace:
+                raise RuntimeError("download failed")
+        self.assertFalse(os.path.exists(workspace))
+
+    def test_every_generation_gets_its_own_workspace(self):
+        with functions.audio_workspace() as first, functions.audio_workspace() as second:
+            self.assertNotEqual(first, second)
+
+
+class StreamAudioTests(SimpleTestCase):
+    def setUp(self):
+        youtube_dl = mock.patch("quiz_app.functions.yt_dlp.YoutubeDL").start()
+        ydl = youtube_dl.return_value.__enter__.return_value
+        ydl.sanitize_info.return_value = {"id": "aXOChLn5ZdQ", "duration": 2}
+        self.popen = mock.patch("quiz_app.functions.subprocess.Popen").start()
+        self.addCleanup(mock.patch.stopall)
+
+    def fake_processes(self, pcm, download_code=0, decode_code=0):
+        download = mock.Mock()
+        download.wait.return_value = download_code
+        decode = mock.Mock(stdout=io.BytesIO(pcm))
+        decode.wait.return_value = decode_code
+        self.popen.side_effect = [download, decode]
+
+    def test_audio_is_decoded_into_waveform(self):
+        samples = np.array([0, 16384, -32768] * 16000, dtype=np.int16)
+        self.fake_processes(samples.tobytes())
+        reported = []
+        with functions.audio_workspace() as workspace:
+            waveform = functions.stream_audio("aXOChLn5ZdQ", workspace, reported.append)
+            self.assertTrue(os.path.isfile(os.path.join(workspace, "info.json")))
+        self.assertEqual(waveform.dtype, np.float32)
+        self.assertEqual(len(waveform), len(samples))
+        self.assertEqual(list(waveform[:3]), [0.0, 0.5, -1.0])
+        self.assertEqual(reported[-1], 100.0)
+        download_command, decode_command = (call.args[0] for call in self.popen.call_args_list)
+        self.assertIn("--load-info-json", download_command)
+        self.assertEqual(decode_command[0], "ffmpeg")
+
+    def test_failed_download_raises_error(self):
+        self.fake_processes(b"", download_code=1)
+        with functions.audio_workspace() as workspace:
+            with self.assertRaises(RuntimeError):
+                functions.stream_audio("aXOChLn5ZdQ", workspace)
+
+
+class PrepareTranscriptTests(SimpleTestCase):
+    def long_transcript(self, sentences=2000):
+        return " ".join(f"Sentence number {i} explains part {i} of the topic." for i in range(sentences))
+
+    def test_short_transcript_is_unchanged(self):
+        self.assertEqual(functions.prepare_transcript("  Short   transcript. "), "Short transcript.")
+
+    def test_only_text_of_whisper_result_is_used(self):
+        result = {"text": "The transcript.", "segments": [{"start": 0.0, "end": 1.0}]}
+        self.assertEqual(functions.prepare_transcript(result), "The transcript.")
+
+    def test_long_transcript_is_condensed_to_budget(self):
+        encoding = whisper.tokenizer.get_encoding("multilingual")
+        transcript = self.long_transcript()
+        condensed = functions.prepare_transcript(transcript, token_budget=2000)
+        self.assertLessEqual(len(encoding.encode(condensed)), 2000)
+        self.assertGreater(len(encoding.encode(condensed)), 1500)
+        self.assertTrue(condensed.startswith("Sentence number 0 "))
+        self.assertIn("Sentence number 1999 ", condensed)
+        numbers = [int(number) for number in re.findall(r"Sentence number (\d+)", condensed)]
+        self.assertEqual(numbers, sorted(numbers))
+
+    def test_sentences_longer_than_a_passage_are_split(self):
+        encoding = whisper.tokenizer.get_encoding("multilingual")
+        passages = functions.split_into_passages("word " * 1000, encoding, passage_tokens=100)
+        self.assertTrue(all(tokens <= 100 for _, tokens in passages))
+        self.assertEqual(sum(tokens for _, tokens in passages), len(encoding.encode("word " * 1000)))
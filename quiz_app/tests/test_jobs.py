@@ -0,0 +1,310 @@
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+
+from django.urls import reverse
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from rest_framework.test import APITestCase
+from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
+
+from quiz_app.models import Quiz, GenerationJob, Transcript, GeneratedQuiz
+from quiz_app.jobs import JobProgress, claim_next_jobs, run_jobs, get_cached_quiz, store_cached_quiz
+
+
+def generated_quiz():
+    return {
+        "title": "generated title",
+        "description": "generated description",
+        "questions": [
+            {"question_title": f"question {i}",
+             "question_options": ["A", "B", "C", "D"],
+             "answer": "A"}
+            for i in range(10)
+        ]
+    }
+
+
+async def read_stream(response):
+    return b"".join([chunk async for chunk in response.streaming_content]).decode()
+
+
+class GenerationJobTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", email="test.mail@testmail.com",
+                                             password="test12345")
+
+        self.user_two = User.objects.create_user(username="testusertwo",
+                                                 email="testmail.two@gmail.com",
+                                                 password="test12345")
+
+    def test_create_quiz_queues_job(self):
+        self.client.force_authenticate(user=self.user)
+        url = reverse("create-quiz")
+        data = {"url": "https://www.youtube.com/watch?v=aXOChLn5ZdQ"}
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["status"], GenerationJob.Status.PENDING)
+        job = GenerationJob.objects.get(pk=response.data["id"])
+        self.assertEqual(job.video_id, "aXOChLn5ZdQ")
+        self.assertEqual(job.user, self.user)
+
+    def test_create_quiz_force_regenerate(self):
+        self.client.force_authenticate(user=self.user)
+        url = reverse("create-quiz")
+        data = {"url": "https://youtu.be/aXOChLn5ZdQ", "force_regenerate": True}
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertTrue(GenerationJob.objects.get(pk=response.data["id"]).force_regenerate)
+
+    def test_create_quiz_invalid_url(self):
+        self.client.force_authenticate(user=self.user)
+        url = reverse("create-quiz")
+        data = {"url": "https://www.example.com/watch?v=aXOChLn5ZdQ"}
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(GenerationJob.objects.exists())
+
+    def test_create_quiz_not_authenticated(self):
+        url = reverse("create-quiz")
+        data = {"url": "https://www.youtube.com/watch?v=aXOChLn5ZdQ"}
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_retrieve_job_successful(self):
+        job = GenerationJob.objects.create(user=self.user, video_id="aXOChLn5ZdQ")
+        self.client.force_authenticate(user=self.user)
+        url = reverse("job-detail", kwargs={"pk": job.pk})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data["quiz"])
+
+    def test_retrieve_job_not_owner(self):
+        job = GenerationJob.objects.create(user=self.user, video_id="aXOChLn5ZdQ")
+        self.client.force_authenticate(user=self.user_two)
+        url = reverse("job-detail", kwargs={"pk": job.pk})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_retrieve_job_not_authenticated(self):
+        job = GenerationJob.objects.create(user=self.user, video_id="aXOChLn5ZdQ")
+        url = reverse("job-detail", kwargs={"pk": job.pk})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_job_events_streams_final_state(self):
+        job = GenerationJob.objects.create(user=self.user, video_id="aXOChLn5ZdQ",
+                                           status=GenerationJob.Status.DONE,
+                                           stage=GenerationJob.Stage.SAVED, progress=100)
+        self.client.cookies["access_token"] = str(AccessToken.for_user(self.user))
+        response = self.client.get(reverse("job-events", kwargs={"pk": job.pk}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        body = async_to_sync(read_stream)(response)
+        self.assertTrue(body.startswith("retry: 3000\n\nevent: saved\ndata: "))
+        self.assertEqual(body.count("event:"), 1)
+
+    @override_settings(GENERATION_JOB_TIMEOUT=0)
+    def test_job_events_stream_ends_after_timeout(self):
+        job = GenerationJob.objects.create(user=self.user, video_id="aXOChLn5ZdQ")
+        self.client.cookies["access_token"] = str(AccessToken.for_user(self.user))
+        response = self.client.get(reverse("job-events", kwargs={"pk": job.pk}))
+        body = async_to_sync(read_stream)(response)
+        self.assertEqual(body.count("event:"), 1)
+
+    def test_job_events_failed_job(self):
+        job = GenerationJob.objects.create(user=self.user, video_id="aXOChLn5ZdQ",
+                                           status=GenerationJob.Status.FAILED,
+                                           error="Failed to download audio. Check URL.")
+        self.client.cookies["access_token"] = str(AccessToken.for_user(self.user))
+        response = self.client.get(reverse("job-events", kwargs={"pk": job.pk}))
+        body = async_to_sync(read_stream)(response)
+        self.assertIn("event: failed", body)
+        self.assertIn("Failed to download audio. Check URL.", body)
+
+    def test_job_events_not_owner(self):
+        job = GenerationJob.objects.create(user=self.user, video_id="aXOChLn5ZdQ")
+        self.client.cookies["access_token"] = str(AccessToken.for_user(self.user_two))
+        response = self.client.get(reverse("job-events", kwargs={"pk": job.pk}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_job_events_not_authenticated(self):
+        job = GenerationJob.objects.create(user=self.user, video_id="aXOChLn5ZdQ")
+        response = self.client.get(reverse("job-events", kwargs={"pk": job.pk}))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_job_events_are_documented_in_schema(self):
+        response = self.client.get(reverse("schema"), {"format": "json"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        paths = response.json()["paths"]
+        self.assertIn("/api/jobs/{id}/", paths)
+        self.assertIn("text/event-stream",
+                      paths["/api/jobs/{id}/events/"]["get"]["responses"]["200"]["content"])
+
+    def test_job_progress_updates_all_claimed_jobs(self):
+        GenerationJob.objects.create(user=self.user, video_id="aXOChLn5ZdQ")
+        GenerationJob.objects.create(user=self.user_two, video_id="aXOChLn5ZdQ")
+        progress = JobProgress(claim_next_jobs())
+        progress(GenerationJob.Stage.TRANSCRIBING, 42.7)
+        self.assertCountEqual(GenerationJob.objects.values_list("stage", "progress"),
+                              [(GenerationJob.Stage.TRANSCRIBING, 42)] * 2)
+
+    def test_claim_next_jobs_claims_oldest_pending_job_once(self):
+        first = GenerationJob.objects.create(user=self.user, video_id="aXOChLn5ZdQ")
+        GenerationJob.objects.create(user=self.user, video_id="7dqMSlv2jeA")
+        jobs = claim_next_jobs()
+        self.assertEqual([job.pk for job in jobs], [first.pk])
+        self.assertEqual(jobs[0].status, GenerationJob.Status.RUNNING)
+        self.assertNotEqual(claim_next_jobs()[0].pk, first.pk)
+        self.assertEqual(claim_next_jobs(), [])
+
+    def test_claim_next_jobs_reclaims_abandoned_job(self):
+        job = GenerationJob.objects.create(user=self.user, video_id="aXOChLn5ZdQ",
+                                           status=GenerationJob.Status.RUNNING,
+                                           started_at=timezone.now() - timedelta(days=1))
+        self.assertEqual(claim_next_jobs()[0].pk, job.pk)
+
+    def test_claim_next_jobs_coalesces_jobs_of_the_same_video(self):
+        first = GenerationJob.objects.create(user=self.user, video_id="aXOChLn5ZdQ")
+        GenerationJob.objects.create(user=self.user, video_id="7dqMSlv2jeA")
+        second = GenerationJob.objects.create(user=self.user_two, video_id="aXOChLn5ZdQ")
+        forced = GenerationJob.objects.create(user=self.user_two, video_id="aXOChLn5ZdQ",
+                                              force_regenerate=True)
+        jobs = claim_next_jobs()
+        self.assertEqual([job.pk for job in jobs], [first.pk, second.pk])
+        self.assertEqual(len({job.claim_token for job in jobs}), 1)
+        self.assertNotIn(forced.pk, [job.pk for job in claim_next_jobs()])
+
+    def test_claim_next_jobs_skips_video_generated_by_another_worker(self):
+        GenerationJob.objects.create(user=self.user, video_id="aXOChLn5ZdQ",
+                                     status=GenerationJob.Status.RUNNING,
+                                     started_at=timezone.now())
+        GenerationJob.objects.create(user=self.user_two, video_id="aXOChLn5ZdQ")
+        self.assertEqual(claim_next_jobs(), [])
+
+    @mock.patch("quiz_app.jobs.create_quiz", return_value=generated_quiz())
+    @mock.patch("quiz_app.jobs.transcribe", return_value={"text": "transcript"})
+    @mock.patch("quiz_app.jobs.stream_audio", return_value="audio.aac")
+    def test_run_jobs_creates_quiz(self, stream_audio, transcribe_audio, create_quiz):
+        GenerationJob.objects.create(user=self.user, video_id="aXOChLn5ZdQ")
+        job = run_jobs(claim_next_jobs())[0]
+        self.assertEqual(job.status, GenerationJob.Status.DONE)
+        self.assertEqual(job.stage, GenerationJob.Stage.SAVED)
+        self.assertEqual(job.quiz.user, self.user)
+        self.assertEqual(job.quiz.questions.count(), 10)
+        stream_audio.assert_called_once_with("aXOChLn5ZdQ", mock.ANY, mock.ANY)
+        transcribe_audio.assert_called_once_with("audio.aac", mock.ANY)
+        self.assertEqual(create_quiz.call_args.args[0], "transcript")
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse("job-detail", kwargs={"pk": job.pk}))
+        self.assertEqual(response.data["quiz"]["title"], "generated title")
+
+    @mock.patch("quiz_app.jobs.create_quiz", return_value=generated_quiz())
+    @mock.patch("quiz_app.jobs.transcribe", return_value={"text": "transcript"})
+    @mock.patch("quiz_app.jobs.stream_audio", return_value="audio.aac")
+    def test_run_jobs_copies_one_generation_to_every_job(self, stream_audio, transcribe_audio,
+                                                          create_quiz):
+        GenerationJob.objects.create(user=self.user, video_id="aXOChLn5ZdQ")
+        GenerationJob.objects.create(user=self.user_two, video_id="aXOChLn5ZdQ")
+        first, second = run_jobs(claim_next_jobs())
+        stream_audio.assert_called_once()
+        transcribe_audio.assert_called_once()
+        create_quiz.assert_called_once()
+        self.assertEqual(first.quiz.user, self.user)
+        self.assertEqual(second.quiz.user, self.user_two)
+        self.assertNotEqual(first.quiz.pk, second.quiz.pk)
+        self.assertEqual(second.quiz.questions.count(), 10)
+
+    @mock.patch("quiz_app.jobs.create_quiz", return_value=generated_quiz())
+    @mock.patch("quiz_app.jobs.transcribe", return_value={"text": "transcript"})
+    @mock.patch("quiz_app.jobs.download_audio", return_value="audio.aac")
+    def test_run_jobs_downloads_audio_file_without_streaming(self, download_audio,
+                                                             transcribe_audio, create_quiz):
+        GenerationJob.objects.create(user=self.user, video_id="aXOChLn5ZdQ")
+        with self.settings(AUDIO_STREAMING=False):
+            job = run_jobs(claim_next_jobs())[0]
+        self.assertEqual(job.status, GenerationJob.Status.DONE)
+        download_audio.assert_called_once_with("aXOChLn5ZdQ", mock.ANY, mock.ANY)
+        transcribe_audio.assert_called_once_with("audio.aac", mock.ANY)
+
+    @mock.patch("quiz_app.jobs.stream_audio", side_effect=Exception("download failed"))
+    def test_run_jobs_failed_download(self, stream_audio):
+        GenerationJob.objects.create(user=self.user, video_id="aXOChLn5ZdQ")
+        GenerationJob.objects.create(user=self.user_two, video_id="aXOChLn5ZdQ")
+        for job in run_jobs(claim_next_jobs()):
+            self.assertEqual(job.status, GenerationJob.Status.FAILED)
+            self.assertEqual(job.error, "Failed to download audio. Check URL.")
+        self.assertFalse(Quiz.objects.exists())
+
+    @mock.patch("quiz_app.jobs.create_quiz", return_value=generated_quiz())
+    @mock.patch("quiz_app.jobs.transcribe", return_value={"text": " transcript "})
+    @mock.patch("quiz_app.jobs.stream_audio", return_value="audio.aac")
+    def test_run_jobs_reuses_cached_transcript(self, stream_audio, transcribe_audio, create_quiz):
+        GenerationJob.objects.create(user=self.user, video_id="aXOChLn5ZdQ")
+        GenerationJob.objects.create(user=self.user_two, video_id="aXOChLn5ZdQ",
+                                     force_regenerate=True)
+        run_jobs(claim_next_jobs())
+        job = run_jobs(claim_next_jobs())[0]
+        self.assertEqual(job.status, GenerationJob.Status.DONE)
+        stream_audio.assert_called_once()
+        transcribe_audio.assert_called_once()
+        self.assertEqual([call.args[0] for call in create_quiz.call_args_list], ["transcript"] * 2)
+        self.assertEqual(Transcript.objects.get(video_id="aXOChLn5ZdQ").text, "transcript")
+
+    @mock.patch("quiz_app.jobs.create_quiz", return_value=generated_quiz())
+    @mock.patch("quiz_app.jobs.get_transcript", return_value="transcript")
+    def test_run_jobs_reuses_cached_quiz(self, get_transcript, create_quiz):
+        GenerationJob.objects.create(user=self.user, video_id="aXOChLn5ZdQ")
+        first = run_jobs(claim_next_jobs())[0]
+        GenerationJob.objects.create(user=self.user_two, video_id="aXOChLn5ZdQ")
+        second = run_jobs(claim_next_jobs())[0]
+        self.assertEqual(create_quiz.call_args.args[0], "transcript")
+        self.assertNotEqual(first.quiz.pk, second.quiz.pk)
+        self.assertEqual(second.quiz.user, self.user_two)
+        self.assertEqual(second.quiz.questions.count(), 10)
+
+    @mock.patch("quiz_app.jobs.create_quiz", return_value=generated_quiz())
+    @mock.patch("quiz_app.jobs.get_transcript", return_value="transcript")
+    def test_run_jobs_force_regenerate_skips_cached_quiz(self, get_transcript, create_quiz):
+        GenerationJob.objects.create(user=self.user, video_id="aXOChLn5ZdQ")
+        GenerationJob.objects.create(user=self.user, video_id="aXOChLn5ZdQ", force_regenerate=True)
+        run_jobs(claim_next_jobs())
+        run_jobs(claim_next_jobs())
+        self.assertEqual(create_quiz.call_count, 2)
+
+    @mock.patch("quiz_app.jobs.create_quiz", return_value={"title": "invalid"})
+    @mock.patch("quiz_app.jobs.get_transcript", return_value="transcript")
+    def test_invalid_quiz_is_not_cached(self, get_transcript, create_quiz):
+        GenerationJob.objects.create(user=self.user, video_id="aXOChLn5ZdQ")
+        job = run_jobs(claim_next_jobs())[0]
+        self.assertEqual(job.status, GenerationJob.Status.FAILED)
+        self.assertFalse(GeneratedQuiz.objects.exists())
+
+
+class GeneratedQuizCacheTests(TestCase):
+    def test_expired_quiz_is_not_used(self):
+        store_cached_quiz("key", generated_quiz())
+        GeneratedQuiz.objects.update(created_at=timezone.now() - timedelta(days=30))
+        with self.settings(QUIZ_CACHE_TTL=60):
+            self.assertIsNone(get_cached_quiz("key"))
+
+    def test_least_recently_used_quizzes_are_evicted(self):
+        with self.settings(QUIZ_CACHE_MAX_ENTRIES=2):
+            store_cached_quiz("first", generated_quiz())
+            store_cached_quiz("second", generated_quiz())
+            GeneratedQuiz.objects.filter(key="first").update(
+                last_used_at=timezone.now() + timedelta(minutes=1))
+            store_cached_quiz("third", generated_quiz())
+        self.assertCountEqual(GeneratedQuiz.objects.values_list("key", flat=True),
+                              ["first", "third"])
+
+    def test_cache_can_be_disabled(self):
+        with self.settings(QUIZ_CACHE_TTL=0):
+            store_cached_quiz("key", generated_quiz())
+            self.assertIsNone(get_cached_quiz("key"))
+        self.assertFalse(GeneratedQuiz.objects.exists())
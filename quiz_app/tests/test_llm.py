@@ -0,0 +1,175 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import httpx
+from django.test import SimpleTestCase, override_settings
+
+from quiz_app import llm
+from quiz_app.api.serializers import CreateQuizSerializer
+from quiz_app.functions import create_quiz
+
+
+@override_settings(QUIZ_LLM_BACKEND="quiz_app.llm.StubBackend", QUIZ_STUB_LATENCY=0)
+class StubBackendTests(SimpleTestCase):
+    def test_stub_quiz_is_valid(self):
+        generated_quiz = create_quiz("A transcript about the solar system.")
+        serializer = CreateQuizSerializer(data={
+            **generated_quiz, "video_url": "https://www.youtube.com/watch?v=aXOChLn5ZdQ"
+        })
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+
+    def test_stub_quiz_is_deterministic(self):
+        self.assertEqual(create_quiz("same transcript"), create_quiz("same transcript"))
+        self.assertNotEqual(create_quiz("same transcript"), create_quiz("other transcript"))
+
+    @override_settings(QUIZ_STUB_LATENCY=0.2)
+    def test_stub_simulates_latency(self):
+        with mock.patch("quiz_app.llm.time.sleep") as sleep:
+            create_quiz("transcript")
+        sleep.assert_called_once_with(0.2)
+
+
+class BackendSelectionTests(SimpleTestCase):
+    @override_settings(QUIZ_LLM_BACKEND="quiz_app.llm.StubBackend")
+    def test_backend_is_selected_in_settings(self):
+        self.assertIsInstance(llm.get_backend(), llm.StubBackend)
+        self.assertIs(llm.get_backend(), llm.get_backend())
+
+    @override_settings(QUIZ_LLM_BACKEND="quiz_app.llm.GeminiBackend", GEMINI_MODEL="gemini-test")
+    def test_cache_name_contains_backend_and_model(self):
+        self.assertEqual(llm.get_backend().cache_name, "GeminiBackend:gemini-test")
+
+
+@override_settings(QUIZ_LLM_BACKEND="quiz_app.llm.OpenAICompatibleBackend",
+                   OPENAI_COMPATIBLE_BASE_URL="http://localhost:8080/v1/",
+                   OPENAI_COMPATIBLE_API_KEY="secret", OPENAI_COMPATIBLE_MODEL="local-model")
+class OpenAICompatibleBackendTests(SimpleTestCase):
+    def setUp(self):
+        llm._backend = None
+        self.addCleanup(setattr, llm, "_backend", None)
+
+    def test_quiz_is_streamed_from_chat_completions(self):
+        content = llm.StubBackend().build_quiz("prompt")
+        events = [f"data: {json.dumps({'choices': [{'delta': {'content': content[i:i + 50]}}]})}"
+                  for i in range(0, len(content), 50)]
+        response = mock.MagicMock()
+        response.__enter__.return_value.iter_lines.return_value = events + ["", "data: [DONE]"]
+        backend = llm.get_backend()
+        with mock.patch.object(backend.client, "stream", return_value=response) as stream:
+            generated_quiz = create_quiz("transcript")
+        self.assertEqual(generated_quiz, json.loads(content))
+        self.assertEqual(stream.call_args.args[1], "http://localhost:8080/v1/chat/completions")
+        request = stream.call_args.kwargs["json"]
+        self.assertEqual(request["model"], "local-model")
+        self.assertEqual(request["response_format"]["json_schema"]["schema"], llm.QUIZ_SCHEMA)
+        self.assertEqual(backend.client.headers["Authorization"], "Bearer secret")
+
+    def test_client_is_shared(self):
+        self.assertIs(llm.get_backend().client, llm.get_backend().client)
+
+
+@override_settings(LLM_MAX_RETRIES=2, LLM_RETRY_MAX_WAIT=0)
+class RetryTests(SimpleTestCase):
+    def status_error(self, status_code):
+        request = httpx.Request("POST", "http://localhost/chat/completions")
+        return httpx.HTTPStatusError("error", request=request,
+                                     response=httpx.Response(status_code, request=request))
+
+    def test_temporary_errors_are_retried(self):
+        backend = llm.OpenAICompatibleBackend()
+        with mock.patch.object(backend, "request",
+                               side_effect=[httpx.ReadTimeout("timeout"), self.status_error(429),
+                                            "response"]) as request:
+            self.assertEqual(backend.generate("prompt"), "response")
+        self.assertEqual(request.call_count, 3)
+
+    def test_retries_are_limited(self):
+        backend = llm.OpenAICompatibleBackend()
+        with mock.patch.object(backend, "request", side_effect=self.status_error(503)) as request:
+            with self.assertRaises(httpx.HTTPStatusError):
+                backend.generate("prompt")
+        self.assertEqual(request.call_count, 3)
+
+    def test_permanent_errors_are_not_retried(self):
+        backend = llm.OpenAICompatibleBackend()
+        with mock.patch.object(backend, "request", side_effect=self.status_error(400)) as request:
+            with self.assertRaises(httpx.HTTPStatusError):
+                backend.generate("prompt")
+        request.assert_called_once()
+
+
+class ConcurrencyLimitTests(SimpleTestCase):
+    @override_settings(LLM_MAX_CONCURRENCY=2)
+    def test_concurrent_requests_are_limited(self):
+        backend = llm.StubBackend()
+        running, peak = 0, 0
+        lock = threading.Lock()
+
+        def request(prompt, schema=None, on_chunk=None):
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            time.sleep(0.05)
+            with lock:
+                running -= 1
+            return prompt
+
+        with mock.patch.object(backend, "request", side_effect=request), \
+                ThreadPoolExecutor(6) as pool:
+            results = list(pool.map(backend.generate, [str(i) for i in range(6)]))
+        self.assertEqual(results, [str(i) for i in range(6)])
+        self.assertEqual(peak, 2)
+
+
+@override_settings(QUIZ_LLM_BACKEND="quiz_app.llm.StubBackend", QUIZ_STUB_LATENCY=0,
+                   QUIZ_REPAIR_ATTEMPTS=2)
+class QuizRepairTests(SimpleTestCase):
+    def quiz(self, prompt):
+        return json.loads(llm.StubBackend().build_quiz(prompt))
+
+    def test_only_missing_questions_are_requested_again(self):
+        quiz = self.quiz("first")
+        quiz["questions"][3]["answer"] = "Not an option"
+        truncated = json.dumps(quiz)[:-200]
+        prompts = []
+
+        def stream(prompt, schema=None):
+            prompts.append((prompt, schema))
+            yield truncated if len(prompts) == 1 else json.dumps(self.quiz("second"))
+
+        with mock.patch.object(llm.StubBackend, "stream", side_effect=stream):
+            generated_quiz = create_quiz("transcript")
+        self.assertEqual(len(prompts), 2)
+        self.assertIs(prompts[1][1], llm.QUESTIONS_SCHEMA)
+        self.assertIn("exactly 2 quiz questions", prompts[1][0])
+        self.assertIn(quiz["questions"][0]["question_title"], prompts[1][0])
+        self.assertEqual(generated_quiz["title"], quiz["title"])
+        self.assertEqual(len(generated_quiz["questions"]), 10)
+        self.assertEqual(generated_quiz["questions"][:3], quiz["questions"][:3])
+
+    def test_broken_connection_keeps_received_questions(self):
+        text = json.dumps(self.quiz("first"))
+        calls = []
+
+        def stream(prompt, schema=None):
+            calls.append(prompt)
+            if len(calls) == 1:
+                yield text[:len(text) // 2]
+                raise httpx.ReadError("connection lost")
+            yield json.dumps(self.quiz("second"))
+
+        with mock.patch.object(llm.StubBackend, "stream", side_effect=stream):
+            generated_quiz = create_quiz("transcript")
+        self.assertEqual(len(calls), 2)
+        self.assertIn("quiz questions", calls[1])
+        self.assertEqual(len(generated_quiz["questions"]), 10)
+
+    def test_incomplete_quiz_raises_error(self):
+        with mock.patch.object(llm.StubBackend, "stream", return_value=iter(["no json"])) as stream:
+            with self.assertRaises(ValueError):
+                create_quiz("transcript")
+        self.assertEqual(stream.call_count, 3)
@@ -0,0 +1,75 @@
+import json
+
+from django.test import SimpleTestCase
+
+from quiz_app.parsing import QuizStreamParser, remove_trailing_commas
+
+
+def question(number, answer_index=0):
+    options = [f"Option {letter} {number}" for letter in "ABCD"]
+    return {"question_title": f"Question {number}", "question_options": options,
+            "answer": options[answer_index]}
+
+
+def quiz_json(questions, description="Description"):
+    return json.dumps({"title": "Title", "description": description, "questions": questions})
+
+
+def feed_in_chunks(parser, text, size=7):
+    for start in range(0, len(text), size):
+        parser.feed(text[start:start + size])
+
+
+class RemoveTrailingCommasTests(SimpleTestCase):
+    def test_trailing_commas_are_removed(self):
+        self.assertEqual(remove_trailing_commas('{"a": [1, 2, ], }'), '{"a": [1, 2 ] }')
+
+    def test_commas_in_strings_are_kept(self):
+        self.assertEqual(remove_trailing_commas('{"a": "x, ]"}'), '{"a": "x, ]"}')
+
+
+class QuizStreamParserTests(SimpleTestCase):
+    def test_quiz_is_parsed_from_chunks(self):
+        reported = []
+        parser = QuizStreamParser(progress_callback=reported.append)
+        feed_in_chunks(parser, quiz_json([question(i) for i in range(10)]))
+        result = parser.result()
+        self.assertEqual(result["title"], "Title")
+        self.assertEqual(result["description"], "Description")
+        self.assertEqual(result["questions"], [question(i) for i in range(10)])
+        self.assertEqual(parser.missing_questions, 0)
+        self.assertEqual(reported[-1], 100.0)
+
+    def test_markdown_fences_and_trailing_commas_are_repaired(self):
+        text = quiz_json([question(i) for i in range(10)]).replace('"}', '",}')
+        parser = QuizStreamParser()
+        feed_in_chunks(parser, f"```json\n{text}\n```")
+        self.assertEqual(len(parser.result()["questions"]), 10)
+
+    def test_truncated_response_keeps_complete_questions(self):
+        text = quiz_json([question(i) for i in range(10)])
+        parser = QuizStreamParser()
+        feed_in_chunks(parser, text[:text.index('{"question_title": "Question 7"') + 30])
+        self.assertEqual(parser.result()["questions"], [question(i) for i in range(7)])
+        self.assertEqual(parser.missing_questions, 3)
+
+    def test_invalid_and_duplicate_questions_are_skipped(self):
+        invalid = {**question(1), "answer": "Not an option"}
+        parser = QuizStreamParser()
+        feed_in_chunks(parser, quiz_json([question(0), invalid, question(0), question(2)]))
+        self.assertEqual(parser.result()["questions"], [question(0), question(2)])
+        self.assertEqual(parser.invalid_questions, 2)
+
+    def test_questions_of_several_responses_are_combined(self):
+        parser = QuizStreamParser()
+        parser.feed(quiz_json([question(i) for i in range(8)]))
+        parser.start()
+        parser.feed(json.dumps({"questions": [question(8), question(9), question(10)]}))
+        self.assertEqual(parser.result()["questions"], [question(i) for i in range(10)])
+
+    def test_too_long_description_is_shortened(self):
+        parser = QuizStreamParser()
+        parser.feed(quiz_json([], description="word " * 50))
+        description = parser.result()["description"]
+        self.assertEqual(len(description), 150)
+        self.assertTrue(description.endswith("..."))
@@ -1,14 +1,30 @@
+import io
+import json
+import os
+import tempfile
+from unittest import mock
+
 from django.urls import reverse
 from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import CommandError
+from django.db import DatabaseError
+from django.test import override_settings
 
 from rest_framework.test import APITestCase
 from rest_framework import status
 
 from quiz_app.models import Quiz, Question
+from quiz_app.api.serializers import CreateQuizSerializer
+from quiz_app.tests import MEMORY_RESPONSE_CACHES
 
 
+@override_settings(CACHES=MEMORY_RESPONSE_CACHES)
 class QuizTests(APITestCase):
     def setUp(self):
+        caches[settings.QUIZ_RESPONSE_CACHE_ALIAS].clear()
         self.user = User.objects.create_user(username="testuser", email="test.mail@testmail.com",
                                              password="test12345")
         
@@ -66,6 +82,61 @@ class QuizTests(APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_get_quizzes_query_count_is_constant(self):
+        self.client.force_authenticate(user=self.user)
+        url = reverse("quiz-list")
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data[0]["questions"]), 10)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_quizzes()
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data), 21)
+        self.assertTrue(all(len(quiz["questions"]) == 10 for quiz in response.data))
+
+    def create_quizzes(self):
+        for i in range(20):
+            quiz = Quiz.objects.create(user=self.user, title=f"quiz {i}", description="description",
+                                       video_url="https://www.youtube.com/watch?v=aXOChLn5ZdQ")
+            Question.objects.bulk_create(
+                Question(quiz=quiz, question_title=f"question {j}",
+                         question_options=["1", "2", "3", "4"], answer="1")
+                for j in range(10))
+
+    def test_get_quizzes_paginated_with_cursor(self):
+        self.client.force_authenticate(user=self.user)
+        for i in range(4):
+            Quiz.objects.create(user=self.user, title=f"quiz {i}", description="description",
+                                video_url="https://www.youtube.com/watch?v=aXOChLn5ZdQ")
+        url = reverse("quiz-list")
+        response = self.client.get(url, {"page_size": 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        titles = [quiz["title"] for quiz in response.data["results"]]
+        self.assertEqual(titles, ["quiz 3", "quiz 2"])
+        response = self.client.get(response.data["next"])
+        titles += [quiz["title"] for quiz in response.data["results"]]
+        response = self.client.get(response.data["next"])
+        titles += [quiz["title"] for quiz in response.data["results"]]
+        self.assertEqual(titles, ["quiz 3", "quiz 2", "quiz 1", "quiz 0", "test title"])
+        self.assertIsNone(response.data["next"])
+
+    def test_get_quizzes_summary(self):
+        self.client.force_authenticate(user=self.user)
+        url = reverse("quiz-list")
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {"fields": "summary"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data[0]), {"id", "title", "description", "created_at"})
+
+    def test_retrieve_quiz_query_count(self):
+        self.client.force_authenticate(user=self.user)
+        url = reverse("quiz-detail", kwargs={"pk": self.quiz.pk})
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual([question["question_title"] for question in response.data["questions"]][:2],
+                         ["question_one", "question_two"])
+
     def test_get_quizzes_not_authenticated(self):
         url = reverse("quiz-list")
         response = self.client.get(url)
@@ -163,4 +234,190 @@ class QuizTests(APITestCase):
         self.client.force_authenticate(user=self.user)
         url = reverse("quiz-detail", kwargs={"pk": 213443})
         response = self.client.delete(url)
-        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(CACHES=MEMORY_RESPONSE_CACHES)
+class QuizResponseCacheTests(APITestCase):
+    def setUp(self):
+        caches[settings.QUIZ_RESPONSE_CACHE_ALIAS].clear()
+        self.addCleanup(caches[settings.QUIZ_RESPONSE_CACHE_ALIAS].clear)
+        self.user = User.objects.create_user(username="testuser", password="test12345")
+        self.quiz = Quiz.objects.create(user=self.user, title="test title",
+                                        description="test description",
+                                        video_url="https://www.youtube.com/watch?v=aXOChLn5ZdQ")
+        Question.objects.create(quiz=self.quiz, question_title="question",
+                                question_options=["1", "2", "3", "4"], answer="1")
+        self.client.force_authenticate(user=self.user)
+        self.list_url = reverse("quiz-list")
+        self.detail_url = reverse("quiz-detail", kwargs={"pk": self.quiz.pk})
+
+    def test_list_is_served_from_cache(self):
+        response = self.client.get(self.list_url)
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.list_url)
+        self.assertEqual(cached.data, response.data)
+        self.assertEqual(cached["ETag"], response["ETag"])
+
+    def test_list_not_modified(self):
+        etag = self.client.get(self.list_url)["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.get(self.list_url, {"fields": "summary"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_patch_invalidates_list_and_detail(self):
+        list_etag = self.client.get(self.list_url)["ETag"]
+        detail_etag = self.client.get(self.detail_url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(self.detail_url, {"title": "title changed"}, format="json")
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]["title"], "title changed")
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["title"], "title changed")
+
+    def test_changed_question_changes_detail_etag(self):
+        response = self.client.get(self.detail_url)
+        question = self.quiz.questions.get()
+        question.question_title = "question changed"
+        with self.captureOnCommitCallbacks(execute=True):
+            question.save()
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=response["ETag"],
+                                   HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["questions"][0]["question_title"], "question changed")
+
+    def test_delete_invalidates_list_and_detail(self):
+        self.client.get(self.list_url)
+        self.client.get(self.detail_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(self.detail_url)
+        self.assertEqual(self.client.get(self.list_url).data, [])
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_created_quiz_invalidates_list(self):
+        self.client.get(self.list_url)
+        serializer = CreateQuizSerializer(data={
+            "title": "new title",
+            "description": "new description",
+            "video_url": "https://www.youtube.com/watch?v=aXOChLn5ZdQ",
+            "questions": [{"question_title": f"question {i}",
+                           "question_options": ["A", "B", "C", "D"], "answer": "A"}
+                          for i in range(10)]
+        })
+        serializer.is_valid(raise_exception=True)
+        with self.captureOnCommitCallbacks() as callbacks:
+            serializer.save(user=self.user)
+        # Until the commit, the old list is still current.
+        self.assertEqual(len(self.client.get(self.list_url).data), 1)
+        for callback in callbacks:
+            callback()
+        response = self.client.get(self.list_url)
+        self.assertEqual([quiz["title"] for quiz in response.data], ["new title", "test title"])
+
+    def test_detail_not_modified(self):
+        response = self.client.get(self.detail_url)
+        self.assertIn("Last-Modified", response)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_cached_detail_checks_owner(self):
+        self.client.get(self.detail_url)
+        other_user = User.objects.create_user(username="other", password="test12345")
+        self.client.force_authenticate(user=other_user)
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(QUIZ_RESPONSE_CACHE_TTL=0)
+    def test_cache_can_be_disabled(self):
+        etag = self.client.get(self.list_url)["ETag"]
+        with self.assertNumQueries(2):
+            self.client.get(self.list_url)
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+@override_settings(CACHES=MEMORY_RESPONSE_CACHES)
+class CreateQuizTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", email="test.mail@testmail.com",
+                                             password="test12345")
+
+    def quiz_data(self, title="imported title"):
+        return {
+            "title": title,
+            "description": "imported description",
+            "video_url": "https://www.youtube.com/watch?v=aXOChLn5ZdQ",
+            "questions": [
+                {"question_title": f"question {i}",
+                 "question_options": ["A", "B", "C", "D"],
+                 "answer": "A"}
+                for i in range(10)
+            ]
+        }
+
+    def test_questions_are_inserted_in_bulk(self):
+        serializer = CreateQuizSerializer(data=self.quiz_data())
+        serializer.is_valid(raise_exception=True)
+        # Savepoint, quiz insert, question insert, release savepoint.
+        with self.assertNumQueries(4):
+            quiz = serializer.save(user=self.user)
+        self.assertEqual(quiz.questions.count(), 10)
+        self.assertEqual(quiz.user, self.user)
+
+    def test_failed_question_insert_rolls_back_quiz(self):
+        serializer = CreateQuizSerializer(data=self.quiz_data())
+        serializer.is_valid(raise_exception=True)
+        with mock.patch("quiz_app.api.serializers.Question.objects.bulk_create",
+                        side_effect=DatabaseError("insert failed")):
+            with self.assertRaises(DatabaseError):
+                serializer.save(user=self.user)
+        self.assertFalse(Quiz.objects.exists())
+
+    def test_many_quizzes_are_created_at_once(self):
+        serializer = CreateQuizSerializer(data=[self.quiz_data(f"quiz {i}") for i in range(5)],
+                                          many=True)
+        serializer.is_valid(raise_exception=True)
+        with self.assertNumQueries(4):
+            quizzes = serializer.save(user=self.user)
+        self.assertEqual(len(quizzes), 5)
+        self.assertEqual(Question.objects.filter(quiz__user=self.user).count(), 50)
+
+    def test_import_quizzes_command(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as file:
+            json.dump([self.quiz_data(f"quiz {i}") for i in range(5)], file)
+        self.addCleanup(os.remove, file.name)
+        call_command("import_quizzes", file.name, user="testuser", batch_size=2,
+                     stdout=io.StringIO())
+        self.assertEqual(Quiz.objects.filter(user=self.user).count(), 5)
+        self.assertEqual(Question.objects.count(), 50)
+
+    def test_benchmark_quiz_list_command(self):
+        stdout = io.StringIO()
+        call_command("benchmark_quiz_list", quizzes=30, questions=2, requests=1, page_size=2, host="testserver",
+                     stdout=stdout)
+        self.assertIn("tenth page", stdout.getvalue())
+        self.assertFalse(User.objects.filter(username="quiz-benchmark").exists())
+
+    def test_benchmark_quiz_list_command_keeps_existing_user(self):
+        quiz = Quiz.objects.create(user=self.user, title="own quiz", description="description",
+                                   video_url="https://www.youtube.com/watch?v=aXOChLn5ZdQ")
+        call_command("benchmark_quiz_list", quizzes=5, questions=1, requests=1, page_size=2,
+                     username="testuser", host="testserver", stdout=io.StringIO())
+        self.assertTrue(User.objects.filter(pk=self.user.pk).exists())
+        self.assertEqual(list(Quiz.objects.filter(user=self.user)), [quiz])
+
+    def test_import_quizzes_command_rejects_invalid_file(self):
+        quizzes = [self.quiz_data(), {**self.quiz_data(), "questions": []}]
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as file:
+            json.dump(quizzes, file)
+        self.addCleanup(os.remove, file.name)
+        with self.assertRaises(CommandError):
+            call_command("import_quizzes", file.name, user="testuser", stdout=io.StringIO())
+        self.assertFalse(Quiz.objects.exists())
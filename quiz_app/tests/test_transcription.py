@@ -0,0 +1,161 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase, override_settings
+
+from quiz_app import functions, transcription
+from quiz_app.transcription import SAMPLE_RATE
+
+
+def speech_with_pauses(pauses, length_seconds):
+    """
+    Returns a noisy waveform with silent parts of one second at the given seconds.
+    """
+    waveform = np.random.default_rng(0).uniform(-0.5, 0.5, length_seconds * SAMPLE_RATE)
+    for pause in pauses:
+        waveform[pause * SAMPLE_RATE:(pause + 1) * SAMPLE_RATE] = 0
+    return waveform.astype(np.float32)
+
+
+class StubWhisperModel:
+    def transcribe(self, waveform, fp16):
+        return {"segments": [{"start": 1.5, "end": 2.0, "text": f" {len(waveform)}"}]}
+
+
+def init_stub_worker(model_name, threads):
+    """
+    Initializer of the spawned test processes. Installs the stub model before the
+    real initializer runs, so no whisper model is loaded.
+    """
+    functions._whisper_models[model_name] = (StubWhisperModel(), threading.Lock())
+    transcription._init_worker(model_name, threads)
+
+
+class ChunkingTests(SimpleTestCase):
+    def test_cuts_are_placed_in_silence(self):
+        waveform = speech_with_pauses([9, 21, 30], 40)
+        cuts = transcription.find_cut_points(waveform, chunk_seconds=10, search_seconds=3)
+        self.assertEqual(cuts[0], 0)
+        self.assertEqual(cuts[-1], len(waveform))
+        self.assertEqual(len(cuts), 5)
+        for cut in cuts[1:-1]:
+            self.assertEqual(waveform[cut], 0)
+
+    def test_windows_overlap_and_cover_the_whole_audio(self):
+        waveform = speech_with_pauses([9, 19, 29], 40)
+        windows = transcription.split_into_windows(waveform, chunk_seconds=10, overlap_seconds=1)
+        self.assertEqual(windows[0][2], 0)
+        self.assertEqual(windows[-1][3], len(waveform))
+        for previous, window in zip(windows, windows[1:]):
+            self.assertEqual(previous[3], window[2])
+            self.assertEqual(window[0], window[2] - SAMPLE_RATE)
+            self.assertEqual(previous[1], previous[3] + SAMPLE_RATE)
+
+    def test_segments_of_overlapping_parts_are_only_used_once(self):
+        first = [{"start": 0.0, "end": 9.0, "text": " one"},
+                 {"start": 10.2, "end": 11.0, "text": " two"}]
+        second = [{"start": 9.5, "end": 10.0, "text": " one"},
+                  {"start": 10.2, "end": 11.0, "text": " two"}]
+        result = transcription.stitch_segments([
+            (10 * SAMPLE_RATE, 20 * SAMPLE_RATE, second),
+            (0, 10 * SAMPLE_RATE, first),
+        ])
+        self.assertEqual(result["text"], " one two")
+        self.assertEqual([segment["id"] for segment in result["segments"]], [0, 1])
+
+
+class SilenceTrimmingTests(SimpleTestCase):
+    def test_speech_regions_skip_long_silence(self):
+        waveform = speech_with_pauses([], 10)
+        waveform[2 * SAMPLE_RATE:6 * SAMPLE_RATE] = 0
+        waveform[8 * SAMPLE_RATE:8 * SAMPLE_RATE + SAMPLE_RATE // 2] = 0
+        regions = transcription.detect_speech(waveform, threshold=0.05, min_silence_seconds=1,
+                                              padding_seconds=0.2)
+        self.assertEqual(regions, [(0, int(2.2 * SAMPLE_RATE)),
+                                   (int(5.8 * SAMPLE_RATE), len(waveform))])
+
+    def test_silence_at_the_edges_is_removed(self):
+        waveform = speech_with_pauses([0, 1, 8, 9], 10)
+        regions = transcription.detect_speech(waveform, threshold=0.05, min_silence_seconds=1,
+                                              padding_seconds=0.2)
+        self.assertEqual(regions, [(int(1.8 * SAMPLE_RATE), int(8.2 * SAMPLE_RATE))])
+
+    @override_settings(VAD_THRESHOLD=0.05, VAD_MIN_SILENCE_SECONDS=1, VAD_PADDING_SECONDS=0)
+    def test_timestamps_are_restored_after_trimming(self):
+        waveform = speech_with_pauses([], 10)
+        waveform[2 * SAMPLE_RATE:6 * SAMPLE_RATE] = 0
+        trimmed, time_map = transcription.trim_silence(waveform)
+        self.assertEqual(len(trimmed), 6 * SAMPLE_RATE)
+        segments = [{"start": 0.5, "end": 2.0, "text": " one"},
+                    {"start": 2.0, "end": 3.5, "text": " two"}]
+        restored = transcription.restore_timestamps(segments, time_map)
+        self.assertEqual([(s["start"], s["end"]) for s in restored], [(0.5, 2.0), (6.0, 7.5)])
+
+    @override_settings(VAD_ENABLED=True, TRANSCRIPTION_WORKERS=1)
+    def test_transcribe_uses_trimmed_audio(self):
+        waveform = speech_with_pauses([3, 4, 5], 10)
+        result = {"text": " one", "segments": [{"start": 3.5, "end": 4.0, "text": " one"}]}
+        with mock.patch("quiz_app.transcription.transcribe_audio",
+                        return_value=result) as transcribe_audio:
+            result = transcription.transcribe(waveform)
+        self.assertLess(len(transcribe_audio.call_args.args[0]), len(waveform))
+        self.assertGreater(result["segments"][0]["start"], 5.5)
+
+
+class TranscribeTests(SimpleTestCase):
+    @override_settings(TRANSCRIPTION_WORKERS=1, VAD_ENABLED=False)
+    def test_single_worker_transcribes_in_process(self):
+        with mock.patch("quiz_app.transcription.transcribe_audio",
+                        return_value={"text": "transcript"}) as transcribe_audio:
+            result = transcription.transcribe("audio.aac")
+        transcribe_audio.assert_called_once_with("audio.aac", None)
+        self.assertEqual(result["text"], "transcript")
+
+    @override_settings(TRANSCRIPTION_WORKERS=2, TRANSCRIPTION_CHUNK_SECONDS=10,
+                       TRANSCRIPTION_CHUNK_OVERLAP=1, VAD_ENABLED=False)
+    def test_long_audio_is_transcribed_in_parallel_chunks(self):
+        waveform = speech_with_pauses([9, 19, 29], 40)
+
+        def transcribe_window(model_name, window, offset_seconds):
+            return [{"start": offset_seconds + 1.5, "end": offset_seconds + 2.0,
+                     "text": f" {round(offset_seconds)}"}]
+
+        reported = []
+        with ThreadPoolExecutor(2) as pool, \
+                mock.patch("quiz_app.transcription._get_pool", return_value=pool), \
+                mock.patch("quiz_app.transcription._transcribe_window",
+                           side_effect=transcribe_window) as transcribe_window_mock:
+            result = transcription.transcribe(waveform, reported.append)
+        self.assertEqual(transcribe_window_mock.call_count, 4)
+        self.assertEqual(len(result["segments"]), 4)
+        starts = [segment["start"] for segment in result["segments"]]
+        self.assertEqual(starts, sorted(starts))
+        self.assertEqual(reported[-1], 100.0)
+
+
+class ProcessPoolTests(SimpleTestCase):
+    def test_transcription_can_be_imported_in_spawned_process(self):
+        # The pool processes are spawned without django.setup(), so importing
+        # quiz_app.transcription must not import any models.
+        with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            energy = pool.submit(transcription.frame_energy,
+                                 np.zeros(SAMPLE_RATE, np.float32)).result()
+        self.assertEqual(energy.tolist(), [0.0] * 10)
+
+    @override_settings(TRANSCRIPTION_WORKERS=2, TRANSCRIPTION_CHUNK_SECONDS=10,
+                       TRANSCRIPTION_CHUNK_OVERLAP=1, VAD_ENABLED=False, WHISPER_MODEL="stub")
+    def test_long_audio_is_transcribed_by_spawned_processes(self):
+        waveform = speech_with_pauses([9, 19, 29], 40)
+        pool = ProcessPoolExecutor(2, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=init_stub_worker, initargs=("stub", 1))
+        self.addCleanup(pool.shutdown)
+        reported = []
+        with mock.patch("quiz_app.transcription._get_pool", return_value=pool):
+            result = transcription.transcribe(waveform, reported.append)
+        self.assertEqual(len(result["segments"]), 4)
+        starts = [segment["start"] for segment in result["segments"]]
+        self.assertEqual(starts, sorted(starts))
+        self.assertEqual(reported[-1], 100.0)
@@ -0,0 +1,262 @@
+import multiprocessing
+import os
+import threading
+import numpy as np
+import torch
+import whisper
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+from quiz_app.functions import get_whisper_model, transcribe_audio
+
+
+SAMPLE_RATE = whisper.audio.SAMPLE_RATE
+FRAME_SECONDS = 0.1
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def frame_energy(waveform, frame_seconds=FRAME_SECONDS):
+    """
+    Returns the RMS energy of consecutive frames of the waveform. A trailing
+    frame that is shorter than frame_seconds is ignored.
+    """
+    frame_length = int(SAMPLE_RATE * frame_seconds)
+    frame_count = len(waveform) // frame_length
+    frames = waveform[:frame_count * frame_length].reshape(frame_count, frame_length)
+    return np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+
+
+def detect_speech(waveform, threshold, min_silence_seconds, padding_seconds):
+    """
+    Returns the (start, end) sample positions of the parts of the waveform that
+    contain speech. A frame counts as silent, if its energy is below threshold times
+    the 90th percentile of all frame energies. Only silent stretches of at least
+    min_silence_seconds are removed and every speech region is padded by
+    padding_seconds, so the beginning and end of words are kept. This is a simple
+    energy detector: it removes silence and very quiet parts, but not loud music.
+    """
+    frame_length = int(SAMPLE_RATE * FRAME_SECONDS)
+    energy = frame_energy(waveform)
+    if len(energy) == 0:
+        return [(0, len(waveform))]
+    silent = energy < threshold * np.percentile(energy, 90)
+    # Start and end frames of all silent stretches.
+    edges = np.diff(np.concatenate(([0], silent.astype(np.int8), [0])))
+    silence_starts = np.flatnonzero(edges == 1)
+    silence_ends = np.flatnonzero(edges == -1)
+    long_enough = (silence_ends - silence_starts) * FRAME_SECONDS >= min_silence_seconds
+    padding = int(padding_seconds / FRAME_SECONDS)
+    silence_starts = silence_starts[long_enough]
+    silence_ends = silence_ends[long_enough]
+    # Silence at the very beginning or end of the audio is removed completely.
+    silence_starts = np.where(silence_starts > 0, silence_starts + padding, 0)
+    silence_ends = np.where(silence_ends < len(energy), silence_ends - padding, len(energy))
+    remaining = silence_ends > silence_starts
+    silence_starts = silence_starts[remaining]
+    silence_ends = silence_ends[remaining]
+    speech_starts = np.concatenate(([0], silence_ends))
+    speech_ends = np.concatenate((silence_starts, [len(energy)]))
+    regions = [(int(start) * frame_length, min(len(waveform), int(end) * frame_length))
+               for start, end in zip(speech_starts, speech_ends) if end > start]
+    if regions:
+        # The trailing partial frame belongs to the last region, if it reaches the end.
+        last_start, last_end = regions[-1]
+        if last_end == len(energy) * frame_length:
+            regions[-1] = (last_start, len(waveform))
+    return regions
+
+
+def trim_silence(waveform):
+    """
+    Removes the silent parts of the waveform (see detect_speech) before it is
+    transcribed. Returns the trimmed waveform and a time map, which is needed to
+    translate timestamps of the trimmed waveform back (see restore_timestamps).
+    If no speech is found, the waveform is returned unchanged.
+    """
+    regions = detect_speech(waveform, settings.VAD_THRESHOLD, settings.VAD_MIN_SILENCE_SECONDS,
+                            settings.VAD_PADDING_SECONDS)
+    if not regions:
+        regions = [(0, len(waveform))]
+    lengths = np.array([end - start for start, end in regions])
+    trimmed_starts = np.concatenate(([0], np.cumsum(lengths)[:-1])) / SAMPLE_RATE
+    original_starts = np.array([start for start, _ in regions]) / SAMPLE_RATE
+    trimmed = np.concatenate([waveform[start:end] for start, end in regions])
+    return trimmed, (trimmed_starts, original_starts)
+
+
+def restore_timestamps(segments, time_map):
+    """
+    Translates the start and end of the segments from the trimmed waveform to the
+    original audio.
+    """
+    trimmed_starts, original_starts = time_map
+    if not segments:
+        return segments
+    starts = np.array([segment["start"] for segment in segments])
+    ends = np.array([segment["end"] for segment in segments])
+    # A segment ending exactly at a region boundary belongs to the region before.
+    start_regions = np.searchsorted(trimmed_starts, starts, side="right") - 1
+    end_regions = np.maximum(np.searchsorted(trimmed_starts, ends, side="left") - 1, 0)
+    original_ends = original_starts[end_regions] + ends - trimmed_starts[end_regions]
+    original_starts = original_starts[start_regions] + starts - trimmed_starts[start_regions]
+    return [{**segment, "start": float(start), "end": float(end)}
+            for segment, start, end in zip(segments, original_starts, original_ends)]
+
+
+def find_cut_points(waveform, chunk_seconds, search_seconds=None):
+    """
+    Returns the sample positions where the waveform is split into chunks of roughly
+    chunk_seconds. Every cut is moved to the quietest frame within search_seconds of
+    the target position, so words are not cut in half. The first position is always 0
+    and the last one the length of the waveform.
+    """
+    if search_seconds is None:
+        search_seconds = min(30.0, chunk_seconds / 4)
+    frame_length = int(SAMPLE_RATE * FRAME_SECONDS)
+    energy = frame_energy(waveform)
+    chunk_frames = int(chunk_seconds / FRAME_SECONDS)
+    search_frames = int(search_seconds / FRAME_SECONDS)
+    cuts = [0]
+    target = chunk_frames
+    while target < len(energy) - search_frames:
+        start = max(cuts[-1] // frame_length + 1, target - search_frames)
+        end = min(len(energy), target + search_frames + 1)
+        quietest = start + int(np.argmin(energy[start:end]))
+        cuts.append(quietest * frame_length + frame_length // 2)
+        target = quietest + chunk_frames
+    cuts.append(len(waveform))
+    return cuts
+
+
+def split_into_windows(waveform, chunk_seconds, overlap_seconds):
+    """
+    Splits the waveform at silence boundaries and returns a list of
+    (window_start, window_end, keep_start, keep_end) sample positions.
+    Every window overlaps its neighbours by overlap_seconds, so the model gets some
+    context at the edges. Only segments starting between keep_start and keep_end
+    are used from a window, so the overlapping parts are not transcribed twice.
+    """
+    overlap = int(SAMPLE_RATE * overlap_seconds)
+    cuts = find_cut_points(waveform, chunk_seconds)
+    return [(max(0, keep_start - overlap), min(len(waveform), keep_end + overlap),
+             keep_start, keep_end)
+            for keep_start, keep_end in zip(cuts, cuts[1:])]
+
+
+def stitch_segments(window_results):
+    """
+    Combines the transcribed windows into one whisper result. window_results is a list
+    of (keep_start, keep_end, segments) with segment timestamps already relative to
+    the whole audio. Segments outside the keep range of their window are dropped.
+    """
+    segments = []
+    for keep_start, keep_end, window_segments in sorted(window_results, key=lambda r: r[0]):
+        for segment in window_segments:
+            if keep_start / SAMPLE_RATE <= segment["start"] < keep_end / SAMPLE_RATE:
+                segments.append({**segment, "id": len(segments)})
+    return {"text": "".join(segment["text"] for segment in segments), "segments": segments}
+
+
+def _init_worker(model_name, threads):
+    """
+    Runs once in every pool process. Loads the whisper model, so it stays in memory
+    for all chunks the process transcribes, and splits the cores between the workers.
+    """
+    torch.set_num_threads(threads)
+    get_whisper_model(model_name)
+
+
+def _transcribe_window(model_name, waveform, offset_seconds):
+    """
+    Transcribes one window in a pool process and returns its segments with
+    timestamps relative to the whole audio.
+    """
+    model, lock = get_whisper_model(model_name)
+    with lock:
+        result = model.transcribe(waveform, fp16=False)
+    return [{"start": segment["start"] + offset_seconds,
+             "end": segment["end"] + offset_seconds,
+             "text": segment["text"]}
+            for segment in result["segments"]]
+
+
+def _get_pool():
+    """
+    Returns the process pool of this process. It is created on first use and reused
+    afterwards, so the workers keep their loaded models between transcriptions.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = settings.TRANSCRIPTION_WORKERS
+            threads = max(1, (os.cpu_count() or 1) // workers)
+            _pool = ProcessPoolExecutor(max_workers=workers,
+                                        mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=_init_worker,
+                                        initargs=(settings.WHISPER_MODEL, threads))
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def transcribe(audio, progress_callback=None):
+    """
+    Transcribes the audio (path or waveform) into text.
+    If VAD_ENABLED is set, silent parts are removed before the audio reaches the
+    model, and the segment timestamps are translated back afterwards.
+    If TRANSCRIPTION_WORKERS is greater than 1, long audio is split into overlapping
+    chunks at silence boundaries, which are transcribed in parallel by a pool of
+    processes. Each of them holds its own whisper model. Afterwards the segments are
+    stitched back together with corrected timestamps. Short audio and a single worker
+    use transcribe_audio directly.
+    The progress_callback is called with the transcribed percentage.
+    """
+    workers = settings.TRANSCRIPTION_WORKERS
+    if workers <= 1 and not settings.VAD_ENABLED:
+        return transcribe_audio(audio, progress_callback)
+    waveform = whisper.load_audio(audio) if isinstance(audio, str) else audio
+    time_map = None
+    if settings.VAD_ENABLED:
+        waveform, time_map = trim_silence(waveform)
+    if workers <= 1 or len(waveform) <= settings.TRANSCRIPTION_CHUNK_SECONDS * SAMPLE_RATE:
+        result = transcribe_audio(waveform, progress_callback)
+    else:
+        result = transcribe_in_chunks(waveform, progress_callback)
+    if time_map is not None:
+        result["segments"] = restore_timestamps(result["segments"], time_map)
+    return result
+
+
+def transcribe_in_chunks(waveform, progress_callback=None):
+    """
+    Transcribes the waveform in overlapping chunks on the process pool and stitches
+    the segments back together.
+    """
+    windows = split_into_windows(waveform, settings.TRANSCRIPTION_CHUNK_SECONDS,
+                                 settings.TRANSCRIPTION_CHUNK_OVERLAP)
+    pool = _get_pool()
+    try:
+        futures = {
+            pool.submit(_transcribe_window, settings.WHISPER_MODEL,
+                        waveform[window_start:window_end], window_start / SAMPLE_RATE):
+            (keep_start, keep_end)
+            for window_start, window_end, keep_start, keep_end in windows
+        }
+        window_results = []
+        for future in as_completed(futures):
+            keep_start, keep_end = futures[future]
+            window_results.append((keep_start, keep_end, future.result()))
+            if progress_callback is not None:
+                progress_callback(100.0 * len(window_results) / len(windows))
+    except BrokenProcessPool:
+        _reset_pool()
+        raise
+    return stitch_segments(window_results)